@@ -1,14 +1,29 @@
 from .objects import (
     RestEncoder, RestResponse, RestObject, RestList, NoneProp, RestResponseObj, ApiModel, ApiCollection,
-    RestEncoderSimple
+    RestEncoderSimple, LazyRestObject, LazyRestList, SharedRestObject, SharedRestList, DeferredRestObject,
+    RestRecord
 )
+from .fields import (
+    Field, IntField, FloatField, StringField, BoolField, DateTimeField, DateField, ModelField, CollectionField
+)
+from .pack import packb, unpackb
 from . import orm
 
 parse = RestResponse.parse
 loads = RestResponse.loads
+iter_loads = RestResponse.iter_loads
 dumps = RestResponse.dumps
+dump = RestResponse.dump
+iterdumps = RestResponse.iterdumps
+register_callable = RestResponse.register_callable
+set_callable_registry_only = RestResponse.set_callable_registry_only
+compile_path = RestResponse.compile_path
 
 __all__ = [
-    'RestEncoder', 'RestResponse', 'RestObject', 'RestList', 'NoneProp', 'parse', 'loads', 'dumps', 'orm',
-    'RestResponseObj', 'ApiModel', 'ApiCollection', 'RestEncoderSimple'
+    'RestEncoder', 'RestResponse', 'RestObject', 'RestList', 'NoneProp', 'parse', 'loads', 'iter_loads', 'dumps',
+    'dump', 'iterdumps', 'orm', 'RestResponseObj', 'ApiModel', 'ApiCollection', 'RestEncoderSimple',
+    'LazyRestObject', 'LazyRestList', 'SharedRestObject', 'SharedRestList', 'DeferredRestObject', 'Field',
+    'IntField', 'FloatField', 'StringField', 'BoolField', 'DateTimeField', 'DateField', 'ModelField',
+    'CollectionField', 'register_callable', 'set_callable_registry_only', 'packb', 'unpackb',
+    'compile_path', 'RestRecord'
 ]
@@ -0,0 +1,119 @@
+from RestResponse.objects import ApiCollection
+
+
+class Field(object):
+    """
+    Declarative ApiModel property stored under its attribute name in `_data`. Subclasses name the ApiModel
+    `_format_<kind>` helper used to convert values; reads use `raises_value_error=False` like the `_get_*` helpers
+    and writes use `raises_value_error` (True by default) like the `_set_*` helpers.
+
+    Converted values are cached per instance and reused for as long as the underlying raw value is unchanged.
+    """
+    kind = None
+
+    def __init__(self, raises_value_error=True, **format_kwargs):
+        self.raises_value_error = raises_value_error
+        self.format_kwargs = format_kwargs
+        self.formatter = '_format_%s' % self.kind if self.kind else None
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def convert(self, instance, value, raises_value_error):
+        if self.formatter is None:
+            return value
+        return getattr(instance, self.formatter)(value, raises_value_error=raises_value_error, **self.format_kwargs)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        raw = instance._data[self.name]
+        cache = instance.__dict__.setdefault('_field_cache', {})
+        cached = cache.get(self.name)
+        if cached is not None and cached[0] is raw:
+            return cached[1]
+        value = self.convert(instance, raw, raises_value_error=False)
+        cache[self.name] = (raw, value)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__.get('_field_cache', {}).pop(self.name, None)
+        instance._data[self.name] = self.convert(instance, value, raises_value_error=self.raises_value_error)
+
+
+class IntField(Field):
+    kind = 'int'
+
+
+class FloatField(Field):
+    kind = 'float'
+
+
+class StringField(Field):
+    kind = 'string'
+
+
+class BoolField(Field):
+    kind = 'bool'
+
+
+class DateTimeField(Field):
+    kind = 'datetime'
+
+    def __init__(self, format='%Y-%m-%dT%H:%M:%SZ', **kwargs):
+        super(DateTimeField, self).__init__(format=format, **kwargs)
+
+
+class DateField(Field):
+    kind = 'date'
+
+    def __init__(self, format='%Y-%m-%d', **kwargs):
+        super(DateField, self).__init__(format=format, **kwargs)
+
+
+class ModelField(Field):
+    """
+    Nested ApiModel, created empty on first read like the hand written `ref` properties
+    """
+    def __init__(self, model):
+        super(ModelField, self).__init__()
+        self.model = model
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        if not instance._data[self.name]:
+            instance._data[self.name] = self.model()
+        return self.model(instance._data[self.name])
+
+    def __set__(self, instance, value):
+        instance._data[self.name] = self.model(value)
+
+
+class CollectionField(Field):
+    """
+    ApiCollection of `item`, either an ApiModel class, a Field instance (e.g. `CollectionField(IntField())`) or a
+    setter callable
+    """
+    def __init__(self, item):
+        super(CollectionField, self).__init__()
+        self.item = item
+
+    def collection(self, instance, iterable=()):
+        if isinstance(self.item, Field):
+            return ApiCollection(
+                getattr(instance, self.item.formatter), iterable,
+                raises_value_error=self.item.raises_value_error, **self.item.format_kwargs
+            )
+        return ApiCollection(self.item, iterable)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        if not instance._data[self.name]:
+            instance._data[self.name] = self.collection(instance)
+        return instance._data[self.name]
+
+    def __set__(self, instance, value):
+        instance._data[self.name] = self.collection(instance, value)
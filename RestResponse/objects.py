@@ -1,32 +1,291 @@
+import functools
+import io
+import itertools
 import json
+import operator
+import threading
+import types
 import warnings
+import weakref
 from datetime import datetime, date
+from decimal import Decimal
+from sys import intern
 
 import autoviv
 from autoviv import NoneProp
 import simplejson
-from dateutil import parser as dateutil_parser
 from sqlalchemy.ext.mutable import Mutable
 
 from RestResponse import utils
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 def _encode_hook(opts):
     def _default(o):
-        if isinstance(o, RestObject):
+        if isinstance(o, dict):
             return {k: _default(v) for k, v in o.items()}
-        elif isinstance(o, RestList) or isinstance(o, ApiCollection):
+        elif isinstance(o, (list, tuple)):
             return [_default(x) for x in o]
         if isinstance(o, ApiModel):
             return _default(o._data)
+        elif isinstance(o, RestRecord):
+            return dict(o.items())
         return utils.encode_item(o, **opts)
     return _default
 
 
-def _decode_hook(obj):
-    for k, v in obj.items():
-        obj[k] = utils.decode_item(v)
-    return obj
+def _encode_float(f, allow_nan=True):
+    if f != f:
+        text = 'NaN'
+    elif f == float('inf'):
+        text = 'Infinity'
+    elif f == -float('inf'):
+        text = '-Infinity'
+    else:
+        return float.__repr__(f)
+    if not allow_nan:
+        raise ValueError('Out of range float values are not JSON compliant: ' + repr(f))
+    return text
+
+
+def _encode_key(key, allow_nan=True):
+    if isinstance(key, str):
+        return key
+    elif isinstance(key, float):
+        return _encode_float(key, allow_nan)
+    elif key is True:
+        return 'true'
+    elif key is False:
+        return 'false'
+    elif key is None:
+        return 'null'
+    elif isinstance(key, int):
+        return int.__repr__(key)
+    raise TypeError('keys must be str, int, float, bool or None, not {0}'.format(key.__class__.__name__))
+
+
+def _primitive_hook(opts):
+    """
+    Convert a tree to the plain dicts, lists and JSON scalars json.loads(json.dumps(...)) would return, applying
+    utils.encode_item at the leaves, in a single pass
+    """
+    scalars = frozenset((str, int, float, bool, type(None)))
+
+    def _convert(o):
+        if o.__class__ in scalars:
+            return o
+        elif isinstance(o, dict):
+            return {
+                k if k.__class__ is str else _encode_key(k): v if v.__class__ in scalars else _convert(v)
+                for k, v in o.items()
+            }
+        elif isinstance(o, (list, tuple)):
+            return [x if x.__class__ in scalars else _convert(x) for x in o]
+        elif isinstance(o, (str, int, float)):
+            return o
+        elif isinstance(o, ApiModel):
+            return _convert(o._data)
+        elif isinstance(o, RestRecord):
+            return _convert(dict(o.items()))
+        value = utils.encode_item(o, **opts)
+        if value is o:
+            raise ValueError('Object of type {0} is not JSON serializable'.format(o.__class__.__name__))
+        return _convert(value)
+    return _encoding_reads(_convert)
+
+
+def _iterencode(o, opts=None, indent=None, separators=None, ensure_ascii=True, sort_keys=False, allow_nan=True,
+                max_depth=None, max_items=None, max_string=None):
+    """
+    Yield the JSON encoding of `o` piece by piece, matching json.dumps output for the same options. Values without
+    a native JSON type are passed through `_encode_hook(opts)` as they are reached.
+
+    `max_depth`, `max_items` and `max_string` truncate containers nested deeper than `max_depth`, containers longer
+    than `max_items` and strings/binaries longer than `max_string` characters, leaving a marker in their place. The
+    output stays valid JSON.
+    """
+    opts = opts or {}
+    default = _encode_hook(opts)
+    encode_binary = opts.get('encode_binary', True)
+    encode_string = json.encoder.encode_basestring_ascii if ensure_ascii else json.encoder.encode_basestring
+    if isinstance(indent, int):
+        indent = ' ' * indent
+    item_separator, key_separator = separators or ((', ', ': ') if indent is None else (',', ': '))
+
+    if max_string is not None:
+        _encode_string = encode_string
+
+        def encode_string(s):
+            if len(s) > max_string:
+                s = '%s... (+%d characters)' % (s[:max_string], len(s) - max_string)
+            return _encode_string(s)
+
+    def encode_container(items, size, level, start, end, encode_item, marker):
+        level += 1
+        if indent is not None:
+            newline = '\n' + indent * level
+            separator = item_separator + newline
+            yield start + newline
+        else:
+            separator = item_separator
+            yield start
+        if max_items is not None and size > max_items:
+            items = itertools.chain(itertools.islice(items, max_items), [marker(size - max_items)])
+        first = True
+        for item in items:
+            if not first:
+                yield separator
+            first = False
+            yield from encode_item(item, level)
+        if indent is not None:
+            yield '\n' + indent * (level - 1)
+        yield end
+
+    def pair_marker(remaining):
+        return '...', '+%d items' % remaining
+
+    def item_marker(remaining):
+        return '... (+%d items)' % remaining
+
+    def encode_pair(pair, level):
+        yield encode_string(_encode_key(pair[0], allow_nan)) + key_separator
+        yield from encode(pair[1], level)
+
+    def encode_binary_value(o):
+        yield '"'
+        if max_string is not None and len(o) > max_string // 4 * 3:
+            size = max_string // 4 * 3
+            yield from utils.iter_encode_binary(utils._buffer_view(o)[:size])
+            yield '... (+%d bytes)' % (len(o) - size)
+        else:
+            # base64 never needs escaping, stream it rather than building the whole string
+            yield from utils.iter_encode_binary(o)
+        yield '"'
+
+    def encode(o, level):
+        if isinstance(o, str):
+            yield encode_string(o)
+        elif o is None:
+            yield 'null'
+        elif o is True:
+            yield 'true'
+        elif o is False:
+            yield 'false'
+        elif isinstance(o, int):
+            yield int.__repr__(o)
+        elif isinstance(o, float):
+            yield _encode_float(o, allow_nan)
+        elif isinstance(o, dict):
+            if not o:
+                yield '{}'
+            elif max_depth is not None and level >= max_depth:
+                yield '"{...}"'
+            else:
+                items = sorted(o.items()) if sort_keys else o.items()
+                yield from encode_container(items, len(o), level, '{', '}', encode_pair, pair_marker)
+        elif isinstance(o, (list, tuple)):
+            if not o:
+                yield '[]'
+            elif max_depth is not None and level >= max_depth:
+                yield '"[...]"'
+            else:
+                yield from encode_container(o, len(o), level, '[', ']', encode, item_marker)
+        elif encode_binary and isinstance(o, utils.BUFFER_TYPES) and not utils.istext(o):
+            yield from encode_binary_value(o)
+        else:
+            value = default(o)
+            if value is o:
+                raise TypeError('Object of type {0} is not JSON serializable'.format(o.__class__.__name__))
+            yield from encode(value, level)
+
+    return encode(o, 0)
+
+
+def _encoding_steps(pieces):
+    # snapshot reads return the shared objects only while each piece is produced, not while the caller holds it
+    step = _encoding_reads(next)
+    while True:
+        try:
+            piece = step(pieces)
+        except StopIteration:
+            return
+        yield piece
+
+
+def _chunked(pieces, chunk_size):
+    chunk = []
+    size = 0
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _decode_value(value):
+    if isinstance(value, str) and value.startswith('__'):
+        return utils.decode_item(value)
+    return value
+
+
+# keys are interned: the json scanner only shares equal keys within a single document
+def _decode_pairs_hook(pairs):
+    return RestObject._from_pairs([
+        (intern(k), RestList(v) if isinstance(v, list) else _decode_value(v)) for k, v in pairs
+    ])
+
+
+def _decode_pairs_hook_compact(pairs):
+    cls = _record_class(tuple([key for key, _ in pairs]))
+    if cls is None:
+        return _decode_pairs_hook(pairs)
+    return cls._make([RestList(v) if isinstance(v, list) else _decode_value(v) for _, v in pairs])
+
+
+class _DecodedDict(dict):
+    """
+    Nested object of a lazy loads, left unwrapped until it is accessed. Its values are already decoded, so wrapping
+    it skips update().
+    """
+    __slots__ = ()
+
+
+def _decode_pairs_hook_lazy(pairs):
+    return _DecodedDict([(intern(k), _decode_value(v)) for k, v in pairs])
+
+
+def _decode_hook(lazy=False, records=None, intern_values=False):
+    """
+    object_pairs_hook for loads/iter_loads. Objects are decoded to RestRecords when `records` is set, otherwise to
+    LazyRestObjects keeping nested lists raw when `lazy`, otherwise to RestObjects with RestList values. Keys are
+    always interned. When `intern_values` is True, string values (also inside lists) are deduplicated through the
+    shared utils.INTERN_TABLE; when it is a utils.InternTable they go through that table instead.
+    """
+    hook = _decode_pairs_hook_compact if records else _decode_pairs_hook_lazy if lazy else _decode_pairs_hook
+    if intern_values is None or intern_values is False:
+        return hook
+    table = utils.INTERN_TABLE if intern_values is True else intern_values
+    interned = table._strings.get
+
+    def _intern(value):
+        # strings already in the table skip the call into it
+        if value.__class__ is str:
+            return interned(value) or table(value)
+        elif value.__class__ is list:
+            return [(interned(x) or table(x)) if x.__class__ is str else _intern(x) for x in value]
+        return value
+
+    def _hook(pairs):
+        return hook([(k, (interned(v) or table(v)) if v.__class__ is str else _intern(v)) for k, v in pairs])
+    return _hook
 
 
 def none_prop_getattr(self, key):
@@ -38,29 +297,179 @@ def none_prop_getattr(self, key):
 NoneProp.__getattr__ = none_prop_getattr
 
 
+class _EncodingState(threading.local):
+    depth = 0
+
+
+_encoding = _EncodingState()
+
+
+def _encoding_reads(func):
+    """
+    Run `func` with snapshot reads returning the shared objects instead of handles. Only for code that encodes and
+    never writes to what it reads.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _encoding.depth += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _encoding.depth -= 1
+    return wrapper
+
+
 class RestEncoder(json.JSONEncoder):
     def __init__(self, *args, **kwargs):
         super(RestEncoder, self).__init__(*args, **kwargs)
         setattr(self, 'default', _encode_hook({}))
 
+    @_encoding_reads
+    def encode(self, o):
+        # the C encoder reads dicts directly, decode a deferred root first
+        if type(o) is DeferredRestObject:
+            o._materialize()
+        return super(RestEncoder, self).encode(o)
+
 
 class RestEncoderSimple(simplejson.JSONEncoder):
     def __init__(self, *args, **kwargs):
         super(RestEncoderSimple, self).__init__(*args, **kwargs)
         setattr(self, 'default', _encode_hook({}))
 
+    @_encoding_reads
+    def encode(self, o):
+        if type(o) is DeferredRestObject:
+            o._materialize()
+        return super(RestEncoderSimple, self).encode(o)
+
     def iterencode(self, o, *args, **kwargs):
         try:
             return super(RestEncoderSimple, self).iterencode(o, *args, **kwargs)
         except Exception:
-            # this could use a better solution
-            return super(RestEncoderSimple, self).iterencode(json.loads(str(o)), *args, **kwargs)
+            # simplejson encodes bytes itself, convert to primitives so binary values go through the encode hook
+            return super(RestEncoderSimple, self).iterencode(self.default(o), *args, **kwargs)
 
 
 json._default_encoder = RestEncoder()
 simplejson._default_encoder = RestEncoderSimple()
 
 
+# simplejson options that keep its output byte-for-byte identical to the stdlib encoder
+_SIMPLEJSON_COMPAT = {
+    'allow_nan': True,
+    'encoding': None,
+    'use_decimal': False,
+    'namedtuple_as_object': False,
+    'for_json': False,
+    'iterable_as_array': False,
+}
+
+
+def _stdlib_dumps(data, **kwargs):
+    return json.dumps(data, cls=RestEncoder, **kwargs)
+
+
+def _simplejson_dumps(data, **kwargs):
+    return simplejson.dumps(data, cls=RestEncoderSimple, **dict(_SIMPLEJSON_COMPAT, **kwargs))
+
+
+JSON_BACKENDS = {
+    'stdlib': _stdlib_dumps,
+    'simplejson': _simplejson_dumps,
+}
+_json_backend = 'stdlib'
+
+
+def _dumps(data, **kwargs):
+    return JSON_BACKENDS[_json_backend](data, **kwargs)
+
+
+# limits on RestObject/RestList repr and str, None disables a limit. See RestResponse.set_repr_policy
+DEFAULT_REPR_POLICY = {'max_depth': 32, 'max_items': 1000, 'max_string': 65536, 'max_length': 2 ** 20}
+_repr_policy = dict(DEFAULT_REPR_POLICY)
+
+
+_REPR_SCALARS = frozenset((int, float, bool, type(None)))
+
+
+def _repr_fits(data, max_depth, max_items, max_string, max_length):
+    """
+    Whether no repr limit can truncate `data`, judged from its depth, container sizes and string lengths without
+    encoding it. Values it can not size cheaply (e.g. ApiModels) count as not fitting. The length is only
+    estimated, _repr still cuts output over `max_length`.
+    """
+    max_depth = float('inf') if max_depth is None else max_depth
+    max_items = float('inf') if max_items is None else max_items
+    max_string = float('inf') if max_string is None else max_string
+    max_length = float('inf') if max_length is None else max_length
+    scalars = _REPR_SCALARS
+    size = 0
+    stack = [(data, 0)]
+    while stack:
+        o, level = stack.pop()
+        if level >= max_depth or len(o) > max_items:
+            return False
+        if isinstance(o, dict):
+            values = o.values() if isinstance(o, SharedRestObject) else dict.values(o)
+        elif isinstance(o, RestRecord):
+            values = o.values()
+        else:
+            values = o
+        size += 2 + 4 * len(o)
+        for v in values:
+            cls = v.__class__
+            if cls is str:
+                if len(v) > max_string:
+                    return False
+                size += len(v)
+            elif cls in scalars:
+                size += 8
+            elif isinstance(v, (dict, list, tuple, RestRecord)):
+                if v:
+                    stack.append((v, level + 1))
+            elif isinstance(v, utils.BUFFER_TYPES):
+                # binary values are shown base64 encoded
+                size += len(v) // 3 * 4 + 16
+                if len(v) // 3 * 4 + 16 > max_string:
+                    return False
+            elif isinstance(v, (date, Decimal)):
+                size += 32
+            elif callable(v) and not isinstance(v, ApiModel):
+                encoded = utils.encode_item(v)
+                if not isinstance(encoded, str) or len(encoded) > max_string:
+                    return False
+                size += len(encoded)
+            else:
+                return False
+        if size > max_length:
+            return False
+    return True
+
+
+@_encoding_reads
+def _repr(data):
+    max_length = _repr_policy['max_length']
+    if _repr_fits(data, _repr_policy['max_depth'], _repr_policy['max_items'], _repr_policy['max_string'], max_length):
+        text = _dumps(data)
+        if max_length is not None and len(text) > max_length:
+            return text[:max_length] + '...'
+        return text
+    pieces = _iterencode(
+        data, max_depth=_repr_policy['max_depth'], max_items=_repr_policy['max_items'],
+        max_string=_repr_policy['max_string']
+    )
+    text = []
+    size = 0
+    for piece in pieces:
+        text.append(piece)
+        size += len(piece)
+        if max_length is not None and size > max_length:
+            # stop walking, the rest of the tree is never encoded
+            return ''.join(text)[:max_length] + '...'
+    return ''.join(text)
+
+
 class RestResponseObj(Mutable, object):
     __opts__ = {
         'encode_binary': True,
@@ -69,6 +478,13 @@ class RestResponseObj(Mutable, object):
         'decode_callable': True
     }
 
+    def __new__(cls, *args, **kwargs):
+        self = super(RestResponseObj, cls).__new__(cls)
+        if _snapshot_epoch:
+            # no snapshot taken so far can share a new object
+            self.__dict__['__epoch__'] = _snapshot_epoch
+        return self
+
     @classmethod
     def coerce(cls, key, value):
         if isinstance(value, dict) and not isinstance(value, RestObject):
@@ -87,17 +503,137 @@ class RestResponseObj(Mutable, object):
     def __json__(self, options=None):
         return _encode_hook(options or self.__opts__)(self)
 
+    def to_primitive(self, opts=None):
+        """
+        Return plain dicts/lists with encoded leaves, equivalent to json.loads(RestResponse.dumps(self))
+        """
+        return _primitive_hook(self.__opts__ if opts is None else opts)(self)
+
+    def snapshot(self):
+        """
+        Return a copy sharing every nested object with `self`, see SharedRestObject. A nested object is only copied
+        when it is written to through the copy, along with the objects on the path to it. Writes to the shared
+        objects through any other tree first save their state for the snapshot, so neither side sees the other's
+        changes. RestRecords are always shared.
+        """
+        global _snapshot_epoch
+        _snapshot_epoch += 1
+        owner = _SnapshotOwner(_snapshot_epoch)
+        _live_snapshots.add(owner)
+        return self._shared_copy(owner)
+
+    def _before_write(self):
+        """
+        Save the state of this object for the live snapshots taken since it last did, call before changing it
+        """
+        state = self.__dict__
+        epoch = state.get('__epoch__', 0)
+        if epoch == _snapshot_epoch:
+            return
+        state['__epoch__'] = _snapshot_epoch
+        own = state.get('__owner__')
+        saved = None
+        for owner in list(_live_snapshots):
+            if owner.epoch > epoch and owner is not own and id(self) not in owner.saved:
+                if saved is None:
+                    saved = self._saved_copy()
+                owner.saved[id(self)] = (self, saved)
+
+    def diff(self):
+        """
+        (op, path, value) changes made since this object was created or last marked clean, `op` being 'add',
+        'replace' or 'remove' and `path` a tuple of keys and list indexes. Lists are replaced as a whole.
+        """
+        changes = []
+        _collect_changes(self, (), changes)
+        return changes
+
+    def as_json_patch(self, opts=None):
+        """
+        diff() as a JSON Patch (RFC 6902) document
+        """
+        convert = _primitive_hook(self.__opts__ if opts is None else opts)
+        patch = []
+        for op, path, value in self.diff():
+            operation = {'op': op, 'path': _json_pointer(path)}
+            if op != 'remove':
+                operation['value'] = convert(value)
+            patch.append(operation)
+        return patch
+
+    def mark_clean(self):
+        """
+        Forget the changes tracked for this object and every object nested in it
+        """
+        self.__dict__.pop('__dirty__', None)
+        for value in (dict.values(self) if isinstance(self, dict) else list.__iter__(self)):
+            if isinstance(value, (RestObject, RestList)):
+                value.mark_clean()
+
+    def get_path(self, path, default=None):
+        """
+        Value at `path` (see compile_path), `default` when any part of it is missing
+        """
+        return compile_path(path)(self, default)
+
+    def get_paths(self, paths, default=None):
+        return [compile_path(path)(self, default) for path in paths]
+
+    def evolve(self, path, value):
+        """
+        Return a snapshot with `value` set at `path`, a dotted string or a sequence of keys. Only the objects along
+        `path` are copied.
+        """
+        keys = _split_path(path)
+        copy = self.snapshot()
+        node = copy
+        for key in keys[:-1]:
+            node = node[_path_key(node, key)]
+        node[_path_key(node, keys[-1])] = value
+        return copy
+
 
 class RestList(RestResponseObj, autoviv.List):
     def __init__(self, iterable=()):
-        for x in iter(iterable):
-            self.append(x)
+        list.extend(self, self._parse_items(iterable))
+
+    @classmethod
+    def _from_items(cls, items):
+        """
+        Build from already parsed items, skipping parse() and changed()
+        """
+        lst = cls.__new__(cls)
+        list.extend(lst, items)
+        return lst
+
+    def _shared_copy(self, owner):
+        copy = SharedRestList._from_items(list.__iter__(self))
+        copy.__dict__['__owner__'] = owner
+        if '__dirty__' in self.__dict__:
+            copy.__dict__['__dirty__'] = True
+        return copy
+
+    def _saved_copy(self):
+        copy = (LazyRestList if isinstance(self, LazyRestList) else RestList)._from_items(list.__iter__(self))
+        if '__dirty__' in self.__dict__:
+            copy.__dict__['__dirty__'] = True
+        return copy
+
+    def changed(self):
+        # any list mutation marks the whole list dirty, diff() replaces it as a whole
+        self.__dict__['__dirty__'] = True
+        self.__dict__.pop('__indexes__', None)
+        super(RestList, self).changed()
+
+    @staticmethod
+    def _parse_items(items):
+        return [RestResponse.parse(x) for x in items if not isinstance(x, NoneProp)]
 
     def __repr__(self):
-        return autoviv.pprint(self, indent=None, cls=RestEncoder)
+        return _repr(self)
 
     def pretty_print(self, indent=4):
-        return autoviv.pprint(self, indent=indent, cls=RestEncoder)
+        return _dumps(self, indent=indent)
 
     def __setitem__(self, index, item):
         if isinstance(item, NoneProp):
@@ -105,6 +641,7 @@ class RestList(RestResponseObj, autoviv.List):
 
         item = RestResponse.parse(item)
 
+        self._before_write()
         super(RestList, self).__setitem__(index, item)
         self.changed()
 
@@ -113,8 +650,11 @@ class RestList(RestResponseObj, autoviv.List):
         self.changed()
 
     def extend(self, items):
-        for item in items:
-            self.append(item)
+        items = self._parse_items(items)
+        if items:
+            self._before_write()
+            list.extend(self, items)
+            self.changed()
 
     def insert(self, index, item):
         if isinstance(item, NoneProp):
@@ -122,10 +662,12 @@ class RestList(RestResponseObj, autoviv.List):
 
         item = RestResponse.parse(item)
 
+        self._before_write()
         super(RestList, self).insert(index, item)
         self.changed()
 
     def pop(self, index=None):
+        self._before_write()
         if index:
             item = super(RestList, self).pop(index)
         else:
@@ -135,35 +677,207 @@ class RestList(RestResponseObj, autoviv.List):
         return item
 
     def remove(self, item):
+        self._before_write()
         super(RestList, self).remove(item)
         self.changed()
 
+    def __delitem__(self, index):
+        self._before_write()
+        super(RestList, self).__delitem__(index)
+        self.changed()
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def __imul__(self, count):
+        self._before_write()
+        super(RestList, self).__imul__(count)
+        self.changed()
+        return self
+
+    def sort(self, *args, **kwargs):
+        self._before_write()
+        super(RestList, self).sort(*args, **kwargs)
+        self.changed()
+
+    def reverse(self):
+        self._before_write()
+        super(RestList, self).reverse()
+        self.changed()
+
+    def clear(self):
+        self._before_write()
+        super(RestList, self).clear()
+        self.changed()
+
+    def _index(self, keys):
+        indexes = self.__dict__.setdefault('__indexes__', {})
+        index = indexes.get(keys)
+        if index is None:
+            getter = _compile_path(keys)
+            index = {}
+            for item in self:
+                try:
+                    index.setdefault(getter(item), []).append(item)
+                except TypeError:
+                    # unhashable values are only matched by scanning
+                    pass
+            # read-only, the cached index is shared by every caller
+            index = indexes[keys] = types.MappingProxyType({value: tuple(items) for value, items in index.items()})
+        return index
+
+    def index_by(self, path):
+        """
+        Read-only {value: items} hash index of the values at `path`, missing values under None. Indexes are built on
+        first use and dropped by changed(); call drop_indexes() after changing indexed values of the items themselves.
+        """
+        return self._index(_split_path(path))
+
+    def drop_indexes(self):
+        self.__dict__.pop('__indexes__', None)
+
+    def where(self, conditions=None, **kwargs):
+        """
+        RestList of the items whose value at each path equals the given value, in index order, e.g.
+        `where(status='active')` or `where({'address.city': 'Boston'})`. Keyword paths may use `__` for dots.
+        """
+        conditions = dict(conditions or {})
+        conditions.update((path.replace('__', '.'), value) for path, value in kwargs.items())
+        conditions = [(_split_path(path), value) for path, value in conditions.items()]
+        candidates = None
+        for keys, value in conditions:
+            try:
+                matches = self._index(keys).get(value, ())
+            except TypeError:
+                matches = None
+            if matches is not None and (candidates is None or len(matches) < len(candidates)):
+                candidates = matches
+        if candidates is None:
+            candidates = self
+        getters = [(_compile_path(keys), value) for keys, value in conditions]
+        return RestList._from_items(item for item in candidates if all(get(item) == value for get, value in getters))
+
+    def find(self, conditions=None, **kwargs):
+        """
+        First item matched by where(), None when nothing matches
+        """
+        matches = self.where(conditions, **kwargs)
+        return matches[0] if matches else None
+
+    def pluck(self, path, default=None):
+        """
+        Plain list of the values at `path`, one per item, `default` for items missing it
+        """
+        getter = compile_path(path)
+        return [getter(item, default) for item in self]
+
+    def to_columns(self, paths, default=None):
+        """
+        {path: pluck(path)} for each of `paths`
+        """
+        return {path: self.pluck(path, default) for path in paths}
+
+    def to_numpy(self, path, dtype=None, missing='nan'):
+        """
+        NumPy array of the values at `path`. Missing and null values are NaN with `missing='nan'`, which turns
+        integer and boolean columns into float64, or masked with `missing='mask'`, which returns a masked array.
+        Requires the numpy package.
+        """
+        if numpy is None:
+            raise ImportError('RestList.to_numpy requires the numpy package')
+        if missing not in ('nan', 'mask'):
+            raise ValueError("missing must be 'nan' or 'mask', not {0!r}".format(missing))
+        values = self.pluck(path)
+        mask = numpy.fromiter((value is None for value in values), dtype=bool, count=len(values))
+        if not mask.any():
+            data = numpy.array(values, dtype=dtype)
+            return numpy.ma.masked_array(data, mask=mask) if missing == 'mask' else data
+
+        present = numpy.array([value for value in values if value is not None], dtype=dtype)
+        if missing == 'mask':
+            data = numpy.zeros(len(values), dtype=present.dtype)
+            data[~mask] = present
+            return numpy.ma.masked_array(data, mask=mask)
+        if present.dtype.kind in 'fc':
+            result_dtype = present.dtype
+        elif dtype is None and present.dtype.kind in 'biu':
+            result_dtype = numpy.float64
+        else:
+            raise ValueError("{0} values at {1} can not hold NaN, use missing='mask'".format(present.dtype, path))
+        data = numpy.full(len(values), numpy.nan, dtype=result_dtype)
+        data[~mask] = present
+        return data
+
 
 class RestObject(RestResponseObj, autoviv.Dict):
     def __init__(self, *args, **kwargs):
         super(RestObject, self).__init__()
         self.update(*args, **kwargs)
+        # a new object starts clean
+        self.__dict__.pop('__dirty__', None)
+
+    @classmethod
+    def _from_pairs(cls, pairs):
+        """
+        Build from already parsed (key, value) pairs, skipping update() and changed()
+        """
+        obj = cls.__new__(cls)
+        dict.update(obj, pairs)
+        obj.__dict__['__none_props__'] = {}
+        return obj
+
+    def _shared_copy(self, owner):
+        copy = SharedRestObject._from_pairs(dict.items(self))
+        copy.__dict__['__owner__'] = owner
+        if '__dirty__' in self.__dict__:
+            copy.__dict__['__dirty__'] = dict(self.__dict__['__dirty__'])
+        return copy
+
+    def _saved_copy(self):
+        copy = (LazyRestObject if isinstance(self, LazyRestObject) else RestObject)._from_pairs(dict.items(self))
+        if '__dirty__' in self.__dict__:
+            copy.__dict__['__dirty__'] = dict(self.__dict__['__dirty__'])
+        return copy
+
+    def _mark_dirty(self, keys):
+        """
+        Record `keys` as changed, call before mutating so whether each key existed beforehand is known
+        """
+        dirty = self.__dict__.setdefault('__dirty__', {})
+        for key in keys:
+            if key not in dirty:
+                dirty[key] = key in self
 
     def __repr__(self):
-        return self.pretty_print(indent=None)
+        return _repr(self)
 
     def __str__(self):
-        return self.pretty_print(indent=None)
+        return _repr(self)
 
     def pretty_print(self, indent=4):
-        return autoviv.pprint(self, indent=indent, cls=RestEncoder)
+        return _dumps(self, indent=indent)
 
     def __delattr__(self, name):
         if name in self:
             del self[name]
-            self.changed()
+
+    def __delitem__(self, key):
+        self._before_write()
+        self._mark_dirty((key,))
+        super(RestObject, self).__delitem__(key)
+        self.changed()
 
     def clear(self):
+        self._before_write()
+        self._mark_dirty(list(dict.keys(self)))
         super(RestObject, self).clear()
         self.changed()
 
     def pop(self, name, default=None):
         if name in self:
+            self._before_write()
+            self._mark_dirty((name,))
             value = super(RestObject, self).pop(name, default)
             self.changed()
         else:
@@ -171,7 +885,9 @@ class RestObject(RestResponseObj, autoviv.Dict):
         return value
 
     def popitem(self):
+        self._before_write()
         value = super(RestObject, self).popitem()
+        self.__dict__.setdefault('__dirty__', {}).setdefault(value[0], True)
         self.changed()
         return value
 
@@ -191,10 +907,13 @@ class RestObject(RestResponseObj, autoviv.Dict):
     def __setattr__(self, key, value):
         if isinstance(value, NoneProp):
             return
-        if key != '__none_props__':
-            value = RestResponse.parse(value)
-
-        super(RestObject, self).__setattr__(key, value)
+        if key == '__none_props__':
+            self.__dict__[key] = value
+        elif hasattr(self.__class__, key) or key in self.__dict__:
+            # same protection as autoviv.Dict.__setattr__, without building dir(self) on every assignment
+            raise AttributeError('"%s" is a protected method. Use key indexing to set attribute.' % key)
+        else:
+            self.update({key: RestResponse.parse(value)})
         self.changed()
 
     def update(self, *args, **kwargs):
@@ -202,9 +921,678 @@ class RestObject(RestResponseObj, autoviv.Dict):
         for k, v in dict(*args, **kwargs).items():
             result[k] = RestResponse.parse(v)
 
+        self._before_write()
+        self._mark_dirty(result)
         super(RestObject, self).update(result)
         self.changed()
 
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
+class LazyRestList(RestList):
+    """
+    RestList that defers wrapping its elements until they are first accessed
+    """
+    def __init__(self, iterable=()):
+        list.extend(self, [x for x in iterable if not isinstance(x, NoneProp)])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        item = super(LazyRestList, self).__getitem__(index)
+        wrapped = RestResponse.parse(item, lazy=True)
+        if wrapped is not item:
+            # wrapping is not a mutation, bypass changed(). The wrapper stands in for the raw value, so it is as old
+            # as this list to snapshots
+            if isinstance(wrapped, RestResponseObj):
+                wrapped.__dict__['__epoch__'] = self.__dict__.get('__epoch__', 0)
+            list.__setitem__(self, index, wrapped)
+        return wrapped
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __contains__(self, item):
+        self._wrap_all()
+        return super(LazyRestList, self).__contains__(item)
+
+    def _wrap_all(self):
+        for index in range(len(self)):
+            self[index]
+
+    def count(self, item):
+        self._wrap_all()
+        return super(LazyRestList, self).count(item)
+
+    def sort(self, *args, **kwargs):
+        # keys see the wrapped items
+        self._wrap_all()
+        super(LazyRestList, self).sort(*args, **kwargs)
+
+    def index(self, item, *args):
+        self._wrap_all()
+        return super(LazyRestList, self).index(item, *args)
+
+    def pop(self, index=None):
+        self[-1 if index is None else index]
+        return super(LazyRestList, self).pop(index)
+
+    def remove(self, item):
+        self._wrap_all()
+        super(LazyRestList, self).remove(item)
+
+
+class LazyRestObject(RestObject):
+    """
+    RestObject that defers wrapping nested dicts and lists until they are first accessed
+    """
+    def __getitem__(self, key):
+        value = super(LazyRestObject, self).__getitem__(key)
+        if isinstance(value, (dict, list)) and not isinstance(value, RestResponseObj):
+            value = RestResponse.parse(value, lazy=True)
+            # wrapping is not a mutation, bypass changed(). The wrapper stands in for the raw value, so it is as old
+            # as this object to snapshots
+            value.__dict__['__epoch__'] = self.__dict__.get('__epoch__', 0)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def _wrap_all(self):
+        for key in list(self.keys()):
+            self[key]
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def items(self):
+        self._wrap_all()
+        return super(LazyRestObject, self).items()
+
+    def values(self):
+        self._wrap_all()
+        return super(LazyRestObject, self).values()
+
+    def pop(self, name, default=None):
+        return RestResponse.parse(super(LazyRestObject, self).pop(name, default), lazy=True)
+
+    def popitem(self):
+        key, value = super(LazyRestObject, self).popitem()
+        return key, RestResponse.parse(value, lazy=True)
+
+    def update(self, *args, **kwargs):
+        result = {}
+        for k, v in dict(*args, **kwargs).items():
+            if isinstance(v, NoneProp):
+                continue
+            elif isinstance(v, (dict, list)):
+                result[k] = v
+            else:
+                result[k] = RestResponse.parse(v)
+
+        self._before_write()
+        self._mark_dirty(result)
+        dict.update(self, result)
+        self.changed()
+
+
+class RestRecord(object):
+    """
+    Compact stand-in for a RestObject with a fixed set of keys, see RestResponse.loads(records='compact'). A class
+    is generated per key shape storing the values in __slots__, so a record costs about as much as a tuple of its
+    values. Keys read like RestObject keys, missing ones as NoneProp, and records encode as JSON objects. Existing
+    keys can be reassigned but changes are not tracked; use to_object() for a full RestObject. snapshot() shares
+    records instead of copying them, so reassigning a key of a record shows in every snapshot.
+    """
+    __slots__ = ()
+    _fields = ()
+    _slots = ()
+    _positions = {}
+
+    @classmethod
+    def _make(cls, values):
+        record = object.__new__(cls)
+        for member, value in zip(cls._members, values):
+            member.__set__(record, value)
+        return record
+
+    def __reduce__(self):
+        return _make_record, (self._fields, self.values())
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return self._values(self)
+
+    def items(self):
+        return zip(self._fields, self._values(self))
+
+    def get(self, key, default=None):
+        index = self._positions.get(key)
+        if index is None:
+            return default
+        return getattr(self, self._slots[index])
+
+    def to_object(self):
+        return RestObject._from_pairs(self.items())
+
+    def __getitem__(self, key):
+        index = self._positions.get(key)
+        if index is None:
+            return self.__getattr__(key)
+        return getattr(self, self._slots[index])
+
+    def __getattr__(self, key):
+        if key.startswith('__') and key.endswith('__'):
+            raise AttributeError(key)
+        return _RecordNoneProp(self, key)
+
+    def __setitem__(self, key, value):
+        index = self._positions.get(key)
+        if index is None:
+            raise KeyError('{0!r} is not a key of this record, use to_object() to add keys'.format(key))
+        object.__setattr__(self, self._slots[index], RestResponse.parse(value))
+
+    def __setattr__(self, key, value):
+        if key not in self._positions:
+            raise AttributeError('{0!r} is not a key of this record, use to_object() to add keys'.format(key))
+        self[key] = value
+
+    def __delattr__(self, key):
+        raise AttributeError('record keys can not be removed, use to_object() to remove keys')
+
+    __delitem__ = __delattr__
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __eq__(self, other):
+        if isinstance(other, RestRecord):
+            return self._fields == other._fields and self.values() == other.values() or \
+                dict(self.items()) == dict(other.items())
+        elif isinstance(other, dict):
+            return dict(self.items()) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return _repr(self)
+
+    def __str__(self):
+        return _repr(self)
+
+    def pretty_print(self, indent=4):
+        return _dumps(self, indent=indent)
+
+    def __json__(self, options=None):
+        return _encode_hook(options or RestResponseObj.__opts__)(dict(self.items()))
+
+    def to_primitive(self, opts=None):
+        return _primitive_hook(RestResponseObj.__opts__ if opts is None else opts)(self)
+
+
+# record class per key shape, None for shapes kept as RestObject
+_RECORD_CLASSES = {}
+MAX_RECORD_SHAPES = 4096
+
+
+def _record_class(keys):
+    """
+    Generated RestRecord class for `keys`, None when objects of that shape stay RestObjects: empty and duplicate
+    keys, keys clashing with slot names and shapes beyond MAX_RECORD_SHAPES
+    """
+    try:
+        return _RECORD_CLASSES[keys]
+    except KeyError:
+        pass
+    if len(_RECORD_CLASSES) >= MAX_RECORD_SHAPES:
+        return None
+    cls = None
+    slots = tuple('_slot%d' % i for i in range(len(keys)))
+    if keys and len(set(keys)) == len(keys) and all(not (isinstance(key, str) and key.startswith('_slot'))
+                                                    for key in keys):
+        cls = type('RestRecord', (RestRecord,), {'__slots__': slots})
+        keys = tuple(intern(key) if isinstance(key, str) else key for key in keys)
+        cls._fields = keys
+        cls._slots = slots
+        cls._positions = {key: index for index, key in enumerate(keys)}
+        cls._members = tuple(cls.__dict__[slot] for slot in slots)
+        getter = operator.attrgetter(*slots)
+        cls._values = staticmethod(getter if len(slots) > 1 else lambda record: (getter(record),))
+        for key, member in zip(keys, cls._members):
+            # keys read straight from their slot, except those shadowed by methods as on RestObject
+            if isinstance(key, str) and not hasattr(cls, key):
+                setattr(cls, key, member)
+    _RECORD_CLASSES[keys] = cls
+    return cls
+
+
+class _RecordNoneProp(NoneProp):
+    """
+    NoneProp of a key missing from a RestRecord. Records can not add keys, so assigning through it raises the same
+    error as assigning the key on the record.
+    """
+    def __getattr__(self, key):
+        if key == '__clause_element__':
+            raise AttributeError(key)
+        return _RecordNoneProp(self, key)
+
+    def _missing_key(self):
+        node = self
+        while isinstance(node.__parent__, NoneProp):
+            node = node.__parent__
+        return '{0!r} is not a key of this record, use to_object() to add keys'.format(node.__key__)
+
+    def __setattr__(self, key, value):
+        if key in ('__parent__', '__key__'):
+            return super(_RecordNoneProp, self).__setattr__(key, value)
+        raise AttributeError(self._missing_key())
+
+    def __setitem__(self, key, value):
+        raise KeyError(self._missing_key())
+
+
+def _make_record(keys, values):
+    cls = _record_class(keys)
+    if cls is None:
+        return RestObject._from_pairs(zip(keys, values))
+    return cls._make(values)
+
+
+def _collect_changes(node, path, changes):
+    dirty = node.__dict__.get('__dirty__')
+    if isinstance(node, list):
+        if dirty:
+            changes.append(('replace', path, node))
+            return
+        children = enumerate(list.__iter__(node))
+    else:
+        dirty = dirty or {}
+        for key, existed in dirty.items():
+            if key in node:
+                changes.append(('replace' if existed else 'add', path + (key,), dict.__getitem__(node, key)))
+            elif existed:
+                changes.append(('remove', path + (key,), None))
+        children = ((key, value) for key, value in dict.items(node) if key not in dirty)
+    for key, value in children:
+        if isinstance(value, (RestObject, RestList)):
+            _collect_changes(value, path + (key,), changes)
+
+
+def _json_pointer(path):
+    return ''.join('/' + str(key).replace('~', '~0').replace('/', '~1') for key in path)
+
+
+def _split_path(path):
+    if isinstance(path, str):
+        return tuple(path.split('.'))
+    return tuple(path)
+
+
+def _path_key(node, key):
+    if isinstance(node, list) and isinstance(key, str):
+        return int(key)
+    return key
+
+
+_MISSING = object()
+
+
+def _path_index(key):
+    if isinstance(key, int):
+        return key
+    elif isinstance(key, str) and key.lstrip('-').isdigit():
+        return int(key)
+    return None
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_path(keys):
+    # (key, list index) per hop, the index also matches int dict keys
+    steps = tuple((key, _path_index(key)) for key in keys)
+
+    def getter(obj, default=None):
+        node = obj
+        for key, index in steps:
+            cls = node.__class__
+            if cls is RestObject or cls is dict:
+                value = dict.get(node, key, _MISSING)
+                if value is _MISSING and index is not None:
+                    value = dict.get(node, index, _MISSING)
+                node = value
+            elif isinstance(node, list):
+                if index is None:
+                    return default
+                try:
+                    node = node[index]
+                except IndexError:
+                    return default
+            elif isinstance(node, RestRecord):
+                node = node.get(key, _MISSING)
+            elif isinstance(node, dict):
+                # lazy, shared and deferred objects wrap or copy values on access
+                if key in node:
+                    node = node[key]
+                elif index is not None and index in node:
+                    node = node[index]
+                else:
+                    return default
+            else:
+                return default
+            if node is _MISSING:
+                return default
+        return node
+    return getter
+
+
+def compile_path(path):
+    """
+    Compile `path`, a dotted string or a sequence of keys, into a `getter(obj, default=None)` that reads it with one
+    lookup per hop. Missing keys and out of range indexes return `default` rather than a NoneProp.
+    """
+    return _compile_path(_split_path(path))
+
+
+class _SnapshotOwner(object):
+    """
+    Identity of a snapshot, set as `__owner__` on the objects it owns. `saved` maps the id() of each shared object
+    written to since the snapshot was taken to the object and a copy of its state before the write.
+    """
+    __slots__ = ('epoch', 'saved', '__weakref__')
+
+    def __init__(self, epoch):
+        self.epoch = epoch
+        self.saved = {}
+
+
+# count of snapshots taken, objects record in `__epoch__` the count when they last saved their state
+_snapshot_epoch = 0
+_live_snapshots = weakref.WeakSet()
+
+
+def _snapshot_state(owner, value):
+    # the object holding the state of `value` when the snapshot was taken
+    saved = owner.saved.get(id(value))
+    if saved is not None and saved[0] is value:
+        return saved[1]
+    return value
+
+
+def _snapshot_value(parent, key, value):
+    """
+    `value` as read from `parent[key]`, `parent` being part of a snapshot: itself when the snapshot owns it,
+    otherwise a handle. Handles are cached weakly, so repeated reads return the same handle while it is in use.
+    """
+    owner = parent.__dict__['__owner__']
+    if _encoding.depth and not owner.saved:
+        # the encoders only read, they may walk the shared objects themselves while none has changed
+        return value
+    if not isinstance(value, (RestObject, RestList)):
+        if isinstance(value, (dict, list)):
+            # raw values of lazy trees are never changed in place, wrapping them is not a copy
+            value = RestResponse.parse(value, lazy=True)
+            value.__dict__['__owner__'] = owner
+            (dict.__setitem__ if isinstance(parent, dict) else list.__setitem__)(parent, key, value)
+        return value
+    elif value.__dict__.get('__owner__') is owner:
+        return value
+    handles = parent.__dict__.get('__handles__')
+    if handles is None:
+        handles = parent.__dict__['__handles__'] = weakref.WeakValueDictionary()
+    handle = handles.get(key)
+    if handle is None or handle.__dict__.get('__pending__', (None, None, None))[2] is not value:
+        handle = _snapshot_state(owner, value)._shared_copy(owner)
+        handle.__dict__['__pending__'] = (parent, key, value)
+        handles[key] = handle
+    return handle
+
+
+def _install(node):
+    """
+    Put the handle `node` in place of the shared object it copies, installing its parents first. Called before
+    every write to a snapshot's objects. A handle whose object was meanwhile removed from its parent stays detached.
+    """
+    pending = node.__dict__.pop('__pending__', None)
+    if pending is None:
+        return
+    parent, key, original = pending
+    _install(parent)
+    if isinstance(parent, list):
+        if not (0 <= key < len(parent) and list.__getitem__(parent, key) is original):
+            key = next((i for i, item in enumerate(list.__iter__(parent)) if item is original), None)
+        if key is not None:
+            list.__setitem__(parent, key, node)
+    elif dict.get(parent, key, _MISSING) is original:
+        dict.__setitem__(parent, key, node)
+
+
+def _detach(parent, value):
+    # objects removed from a snapshot may still be shared with other trees
+    owner = parent.__dict__['__owner__']
+    if isinstance(value, (RestObject, RestList)) and value.__dict__.get('__owner__') is not owner:
+        return _snapshot_state(owner, value)._shared_copy(owner)
+    return value
+
+
+def _mark_clean_shared(node, items):
+    if not node.diff():
+        return
+    _install(node)
+    node.__dict__.pop('__dirty__', None)
+    for key, value in items:
+        if isinstance(value, (RestObject, RestList)) and value.diff():
+            # clearing shared objects would clear them for every tree
+            value = node[key]
+            _install(value)
+            value.mark_clean()
+
+
+class SharedRestList(RestList):
+    """
+    RestList of a snapshot, see SharedRestObject
+    """
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        value = super(SharedRestList, self).__getitem__(index)
+        return _snapshot_value(self, index + len(self) if index < 0 else index, value)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __reversed__(self):
+        for index in range(len(self) - 1, -1, -1):
+            yield self[index]
+
+    def copy(self):
+        return list(self)
+
+    def __add__(self, other):
+        return list(self) + other
+
+    def __mul__(self, count):
+        return list(self) * count
+
+    __rmul__ = __mul__
+
+    def __setitem__(self, index, item):
+        _install(self)
+        super(SharedRestList, self).__setitem__(index, item)
+
+    def insert(self, index, item):
+        _install(self)
+        super(SharedRestList, self).insert(index, item)
+
+    def extend(self, items):
+        _install(self)
+        super(SharedRestList, self).extend(items)
+
+    def pop(self, index=None):
+        _install(self)
+        return _detach(self, super(SharedRestList, self).pop(index))
+
+    def remove(self, item):
+        _install(self)
+        super(SharedRestList, self).remove(item)
+
+    def __delitem__(self, index):
+        _install(self)
+        super(SharedRestList, self).__delitem__(index)
+
+    def clear(self):
+        _install(self)
+        super(SharedRestList, self).clear()
+
+    def __imul__(self, count):
+        _install(self)
+        return super(SharedRestList, self).__imul__(count)
+
+    def sort(self, *args, **kwargs):
+        _install(self)
+        super(SharedRestList, self).sort(*args, **kwargs)
+
+    def reverse(self):
+        _install(self)
+        super(SharedRestList, self).reverse()
+
+    def mark_clean(self):
+        _mark_clean_shared(self, enumerate(list.__iter__(self)))
+
+
+class SharedRestObject(RestObject):
+    """
+    RestObject of a snapshot, see RestResponseObj.snapshot. Its storage refers to the objects it shares with other
+    trees, and reading one returns a handle: a SharedRestObject/SharedRestList copy of it that is not stored
+    anywhere. The first write to a handle puts it, and the handles on the path to it, in place of the objects they
+    copy, so only the objects along written paths are ever duplicated and reads leave the trees sharing. Writes
+    through other trees save the shared object's state first, and handles are made from that saved state.
+    """
+    def __getitem__(self, key):
+        return _snapshot_value(self, key, super(SharedRestObject, self).__getitem__(key))
+
+    def __iter__(self):
+        # dict(), {**obj} and dict.update copy dict subclasses without reading values unless __iter__ is overridden
+        return dict.__iter__(self)
+
+    def copy(self):
+        return dict(self.items())
+
+    def __or__(self, other):
+        if not isinstance(other, dict):
+            return NotImplemented
+        merged = self.copy()
+        merged.update(other)
+        return merged
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def items(self):
+        return [(key, self[key]) for key in dict.keys(self)]
+
+    def values(self):
+        return [self[key] for key in dict.keys(self)]
+
+    def update(self, *args, **kwargs):
+        _install(self)
+        super(SharedRestObject, self).update(*args, **kwargs)
+
+    def __delitem__(self, key):
+        _install(self)
+        super(SharedRestObject, self).__delitem__(key)
+
+    def clear(self):
+        _install(self)
+        super(SharedRestObject, self).clear()
+
+    def pop(self, name, default=None):
+        _install(self)
+        return _detach(self, super(SharedRestObject, self).pop(name, default))
+
+    def popitem(self):
+        _install(self)
+        key, value = super(SharedRestObject, self).popitem()
+        return key, _detach(self, value)
+
+    def mark_clean(self):
+        _mark_clean_shared(self, list(dict.items(self)))
+
+
+class DeferredRestObject(RestObject):
+    """
+    RestObject holding the raw JSON object it will be decoded from. Decoding happens on first access, after which
+    this becomes a plain RestObject (LazyRestObject when `lazy`). Until then `__dict__['_raw']` holds `raw`
+    unchanged, so an untouched value can be written back without encoding it again.
+    """
+    def __init__(self, raw, lazy=False):
+        self.__dict__['_raw'] = raw
+        self.__dict__['_lazy'] = lazy
+        self.__dict__['__none_props__'] = {}
+        # the C encoders write empty dicts without calling items(), keep the storage non-empty until decoded
+        dict.__setitem__(self, _UNDECODED, None)
+
+    def __getattribute__(self, name):
+        if name not in _DEFERRED_ATTRIBUTES:
+            object.__getattribute__(self, '_materialize')()
+        return object.__getattribute__(self, name)
+
+    def _materialize(self):
+        if type(self) is not DeferredRestObject:
+            return
+        state = self.__dict__
+        lazy = state.pop('_lazy')
+        data = RestResponse.loads(state.pop('_raw'), lazy=lazy)
+        if not isinstance(data, RestObject):
+            raise ValueError('DeferredRestObject data must be a JSON object')
+        dict.clear(self)
+        dict.update(self, data)
+        object.__setattr__(self, '__class__', LazyRestObject if lazy else RestObject)
+
+
+# placeholder key of an undecoded DeferredRestObject, not a str so it can never be encoded as a JSON key
+_UNDECODED = object()
+
+# attributes that do not decode a DeferredRestObject, SQLAlchemy's Mutable reads _parents when rows are loaded
+_DEFERRED_ATTRIBUTES = frozenset(('__dict__', '__class__', '_materialize', '_parents', 'coerce'))
+
+
+def _deferred_method(name):
+    def method(self, *args, **kwargs):
+        self._materialize()
+        return getattr(self, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+# implicit special method calls skip __getattribute__, decode before delegating to the decoded class
+for _name in (
+    '__len__', '__iter__', '__reversed__', '__contains__', '__getitem__', '__setitem__', '__delitem__', '__eq__',
+    '__ne__', '__repr__', '__str__', '__sizeof__', '__or__', '__ror__', '__ior__'
+):
+    if hasattr(dict, _name):
+        setattr(DeferredRestObject, _name, _deferred_method(_name))
+del _name
+
 
 class RestResponse(object):
     def __new__(self, data, **kwargs):
@@ -214,13 +1602,15 @@ class RestResponse(object):
             return RestResponse.parse(data)
 
     @staticmethod
-    def parse(data):
+    def parse(data, lazy=False):
         if isinstance(data, RestResponseObj) or isinstance(data, NoneProp):
             return data
         elif isinstance(data, dict):
-            return RestObject(data)
+            if lazy and data.__class__ is _DecodedDict:
+                return LazyRestObject._from_pairs(dict.items(data))
+            return LazyRestObject(data) if lazy else RestObject(data)
         elif isinstance(data, list):
-            return RestList(data)
+            return LazyRestList(data) if lazy else RestList(data)
         else:
             # decode properties encoded by RestResponse
             if isinstance(data, str) and (data.startswith(('__callable__: ', '__binary__'))):
@@ -230,21 +1620,144 @@ class RestResponse(object):
             return data
 
     @staticmethod
-    def loads(data, **kwargs):
+    def loads(data, lazy=False, records=None, intern_values=False, **kwargs):
+        """
+        With `records='compact'` every object but the root is loaded as a RestRecord, which takes a fraction of the
+        memory of a RestObject but has a fixed set of keys and does not track changes. Meant for reading large
+        arrays of records.
+
+        Keys are always interned. With `intern_values=True` short string values of objects, e.g. status enums, are
+        deduplicated through the shared utils.INTERN_TABLE, or through `intern_values` when it is a
+        utils.InternTable.
+        """
+        if records not in (None, 'compact'):
+            raise ValueError("records must be None or 'compact', not {0!r}".format(records))
+        elif records and lazy:
+            raise ValueError('RestResponse.loads records and lazy can not be combined')
+        hook = _decode_hook(lazy=lazy, records=records, intern_values=intern_values)
         try:
-            data = json.loads(data, object_hook=_decode_hook, **kwargs)
+            data = json.loads(data, object_pairs_hook=hook, **kwargs)
         except Exception:
             raise ValueError('RestResponse.loads data must be JSON deserializable')
 
-        return RestResponse.parse(data)
+        if isinstance(data, RestRecord):
+            data = data.to_object()
+        return RestResponse.parse(data, lazy=lazy)
+
+    @staticmethod
+    def iter_loads(source, path='items.item', lazy=False, chunk_size=65536, intern_values=False):
+        """
+        Incrementally parse `source` (a file object or an iterable of str/bytes chunks), yielding each value found
+        at `path` as it is decoded. See utils.JSONStreamReader for the path syntax and loads for `intern_values`.
+        """
+        decoder = json.JSONDecoder(object_pairs_hook=_decode_hook(lazy=lazy, intern_values=intern_values))
+        reader = utils.JSONStreamReader(source, decoder=decoder, chunk_size=chunk_size)
+        try:
+            for value in reader.iter_path(path):
+                yield RestResponse.parse(value, lazy=lazy)
+        except ValueError as e:
+            raise ValueError('RestResponse.iter_loads data must be JSON deserializable') from e
 
     @staticmethod
     def dumps(data, **kwargs):
         try:
-            return json.dumps(data, cls=RestEncoder, **kwargs)
+            return _dumps(data, **kwargs)
         except Exception:
             raise ValueError('RestResponse.dumps data must be JSON serializable')
 
+    @staticmethod
+    def iterdumps(data, chunk_size=65536, **kwargs):
+        """
+        Yield the JSON encoding of `data` in chunks of roughly `chunk_size` characters, without building the whole
+        document in memory. Accepts the indent, separators, ensure_ascii, sort_keys and allow_nan options of dumps.
+        """
+        try:
+            yield from _chunked(_encoding_steps(_iterencode(data, **kwargs)), chunk_size)
+        except Exception:
+            raise ValueError('RestResponse.iterdumps data must be JSON serializable')
+
+    @staticmethod
+    def dump(data, fp, chunk_size=65536, **kwargs):
+        """
+        Stream the JSON encoding of `data` to the file object `fp`, encoding to UTF-8 for binary files
+        """
+        binary = isinstance(fp, (io.RawIOBase, io.BufferedIOBase)) or 'b' in getattr(fp, 'mode', '')
+        for chunk in RestResponse.iterdumps(data, chunk_size=chunk_size, **kwargs):
+            fp.write(chunk.encode('utf-8') if binary else chunk)
+
+    @staticmethod
+    def set_json_backend(name):
+        """
+        Select the backend used by dumps, pretty_print and repr. Backends must produce output identical to the
+        stdlib encoder; register additional ones with register_json_backend
+        """
+        global _json_backend
+        if name not in JSON_BACKENDS:
+            raise ValueError('Unknown JSON backend {0}, expected one of {1}'.format(name, sorted(JSON_BACKENDS)))
+        _json_backend = name
+
+    @staticmethod
+    def register_json_backend(name, dumps):
+        JSON_BACKENDS[name] = dumps
+
+    @staticmethod
+    def compile_path(path):
+        return compile_path(path)
+
+    @staticmethod
+    def set_repr_policy(**limits):
+        """
+        Update the `max_depth`, `max_items`, `max_string` and `max_length` limits applied by repr and str, None
+        disables a limit. pretty_print and dumps always encode the full tree.
+        """
+        unknown = set(limits) - set(DEFAULT_REPR_POLICY)
+        if unknown:
+            raise ValueError('Unknown repr limits {0}, expected any of {1}'.format(
+                sorted(unknown), sorted(DEFAULT_REPR_POLICY)
+            ))
+        _repr_policy.update(limits)
+
+    @staticmethod
+    def register_callable(func, name=None):
+        """
+        Encode `func` as a short registered name instead of a pickle, see utils.register_callable
+        """
+        return utils.register_callable(func, name=name)
+
+    @staticmethod
+    def set_callable_registry_only(enabled=True):
+        utils.set_callable_registry_only(enabled)
+
+
+_api_model_fields_cache = weakref.WeakKeyDictionary()
+
+
+def _api_model_fields(cls, overrides):
+    """
+    Names the ApiModel data setter assigns from matching keys: the public attributes of `cls`, plus `overrides`, in
+    dir() order. Methods and read-only properties are left out, assigning them would shadow the method or raise.
+    Cached per class and overrides, so changing `__opts__['_overrides']` picks up a fresh entry, and entries go away
+    with their class.
+    """
+    by_overrides = _api_model_fields_cache.get(cls)
+    if by_overrides is None:
+        by_overrides = _api_model_fields_cache[cls] = {}
+    fields = by_overrides.get(overrides)
+    if fields is None:
+        fields = []
+        for name in dir(cls):
+            if name.startswith('_') and name not in overrides:
+                continue
+            attribute = getattr(cls, name, None)
+            if isinstance(attribute, property):
+                if attribute.fset is None:
+                    continue
+            elif callable(attribute) and not hasattr(type(attribute), '__set__'):
+                continue
+            fields.append(name)
+        fields = by_overrides[overrides] = tuple(fields)
+    return fields
+
 
 class ApiModel(object):
     __opts__ = {
@@ -257,6 +1770,11 @@ class ApiModel(object):
         '_overrides': [],
     }
 
+    def __init_subclass__(cls, **kwargs):
+        super(ApiModel, cls).__init_subclass__(**kwargs)
+        # resolve the settable fields (properties and RestResponse.fields descriptors) once at class creation
+        _api_model_fields(cls, tuple(cls.__opts__.get('_overrides', [])))
+
     def __bool__(self):
         return bool(self._data)
 
@@ -286,13 +1804,20 @@ class ApiModel(object):
             data = data._data
 
         self.__data = RestResponse.parse({})
-        for prop in dir(self):
-            if (not prop.startswith('_') or prop in self.__opts__.get('_overrides', [])) and prop in data:
+        overrides = tuple(self.__opts__.get('_overrides', []))
+        fields = _api_model_fields(self.__class__, overrides)
+        # instance attributes set before _data are not part of the class fields
+        extra = [
+            name for name in self.__dict__
+            if (not name.startswith('_') or name in overrides) and not hasattr(self.__class__, name)
+        ]
+        for prop in sorted(fields + tuple(extra)) if extra else fields:
+            if prop in data:
                 setattr(self, prop, data[prop])
 
     @property
     def _as_json(self):
-        return json.loads(json.dumps(self._data, default=_encode_hook(self.__opts__)))
+        return _primitive_hook(self.__opts__)(self._data)
 
     def _set_datetime(self, d, format='%Y-%m-%dT%H:%M:%SZ'):
         return self._format_datetime(d, format=format, raises_value_error=True)
@@ -301,18 +1826,18 @@ class ApiModel(object):
         return self._format_datetime(d, format=format, raises_value_error=False)
 
     def _format_datetime(self, d, format='%Y-%m-%dT%H:%M:%SZ', raises_value_error=False):
-        if not isinstance(d, datetime) or not isinstance(d, date):
-            try:
-                d = dateutil_parser.parse(d)
-                return datetime.strptime(d.strftime(format), format)
-            except ValueError:
-                if raises_value_error:
-                    raise
-                else:
-                    warnings.warn('Value must be date or datetime')
-                    return None
-        else:
+        if isinstance(d, datetime):
             return d
+        elif isinstance(d, date):
+            return datetime(d.year, d.month, d.day)
+        try:
+            return utils.parse_datetime(d, format=format)
+        except ValueError:
+            if raises_value_error:
+                raise
+            else:
+                warnings.warn('Value must be date or datetime')
+                return None
 
     def _set_date(self, d, format='%Y-%m-%d'):
         return self._format_date(d, format=format, raises_value_error=True)
@@ -321,18 +1846,18 @@ class ApiModel(object):
         return self._format_date(d, format=format, raises_value_error=False)
 
     def _format_date(self, d, format='%Y-%m-%d', raises_value_error=False):
-        if not isinstance(d, date):
-            try:
-                d = dateutil_parser.parse(d)
-                return datetime.strptime(d.strftime(format), format).date()
-            except ValueError:
-                if raises_value_error:
-                    raise
-                else:
-                    warnings.warn('Value must be date')
-                    return None
-        else:
+        if isinstance(d, datetime):
+            return d.date()
+        elif isinstance(d, date):
             return d
+        try:
+            return utils.parse_date(d, format=format)
+        except ValueError:
+            if raises_value_error:
+                raise
+            else:
+                warnings.warn('Value must be date')
+                return None
 
     def _set_string(self, s):
         return self._format_string(s, raises_value_error=True)
@@ -397,6 +1922,7 @@ class ApiCollection(RestList):
         self.setter = setter
         self.setter_kwargs = setter_kwargs
         self.extend(iterable)
+        self.__dict__.pop('__dirty__', None)
 
     @property
     def _data(self):
@@ -404,7 +1930,7 @@ class ApiCollection(RestList):
 
     @property
     def _as_json(self):
-        return json.loads(json.dumps(self, default=_encode_hook(self.__opts__)))
+        return self.to_primitive(self.__opts__)
 
     def append(self, item):
         self.insert(len(self), item)
@@ -415,8 +1941,8 @@ class ApiCollection(RestList):
             super(ApiCollection, self).insert(index, value)
 
     def extend(self, items):
-        for item in items:
-            self.append(item)
+        values = [self.setter(item, **self.setter_kwargs) for item in items]
+        super(ApiCollection, self).extend([value for value in values if value is not None])
 
     def __setitem__(self, index, value):
         if index >= 0 and index < len(self):
@@ -1,27 +1,221 @@
-from sqlalchemy import types
+from sqlalchemy import types, func, literal, cast, update, and_, inspect
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm.attributes import set_committed_value
 import json
-from RestResponse import RestResponse, RestResponseObj, RestEncoder
+import lzma
+import re
+import zlib
+from RestResponse import RestResponse, RestResponseObj, RestEncoder, DeferredRestObject
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_JSON_OBJECT_START = {bytes: re.compile(br'\s*{'), str: re.compile(r'\s*{')}
+
+# compressed values start with a NUL byte, which never starts a JSON document, and a codec id
+COMPRESSION_MAGIC = b'\x00RR'
+
+
+def _zstd_compress(data, level):
+    return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+
+def _zstd_decompress(data):
+    if zstandard is None:
+        raise ValueError('zstd compressed data requires the zstandard package')
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+# name: (codec id, compress(data, level), decompress(data))
+COMPRESSION_CODECS = {
+    'zlib': (b'z', lambda data, level: zlib.compress(data, -1 if level is None else level), zlib.decompress),
+    'lzma': (b'x', lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+    'zstd': (b's', _zstd_compress, _zstd_decompress),
+}
+_COMPRESSION_IDS = {codec[0]: codec[2] for codec in COMPRESSION_CODECS.values()}
+
+
+def compress(data, compression, level=None):
+    codec_id, _compress, _ = COMPRESSION_CODECS[compression]
+    return COMPRESSION_MAGIC + codec_id + _compress(data, level)
+
+
+def decompress(data):
+    """
+    Decompress `data` stored with a COMPRESSION_MAGIC header, returning anything else unchanged
+    """
+    if not isinstance(data, bytes) or not data.startswith(COMPRESSION_MAGIC):
+        return data
+    codec_id = data[len(COMPRESSION_MAGIC):len(COMPRESSION_MAGIC) + 1]
+    if codec_id not in _COMPRESSION_IDS:
+        raise ValueError('Unknown compression id {0!r}'.format(codec_id))
+    return _COMPRESSION_IDS[codec_id](memoryview(data)[len(COMPRESSION_MAGIC) + 1:])
 
 
 class RestResponseEncodedObj(types.TypeDecorator):
+    """
+    Stores values as JSON encoded bytes. Objects are loaded as DeferredRestObject and only decoded when accessed;
+    untouched ones are written back as the bytes they were loaded from.
+
+    With `compression` ('zlib', 'lzma', 'zstd' or 'zstd-if-available', which falls back to zlib), values of at least
+    `threshold` bytes are compressed at `level` and stored behind a magic header. Rows without the header are read
+    as plain JSON, so compression can be enabled on existing columns.
+    """
     impl = types.LargeBinary
     cache_ok = True
 
+    def __init__(self, compression=None, level=None, threshold=1024):
+        super(RestResponseEncodedObj, self).__init__()
+        if compression == 'zstd-if-available':
+            compression = 'zstd' if zstandard is not None else 'zlib'
+        if compression is not None and compression not in COMPRESSION_CODECS:
+            raise ValueError('Unknown compression {0}, expected one of {1}'.format(
+                compression, sorted(COMPRESSION_CODECS)
+            ))
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError('zstd compression requires the zstandard package')
+        self.compression = compression
+        self.level = level
+        self.threshold = threshold
+
     def process_bind_param(self, value, dialect):
-        if value is not None:
+        if type(value) is DeferredRestObject:
+            stored = value.__dict__.get('_stored')
+            if stored is not None:
+                return stored
+            result = value.__dict__['_raw']
+        elif value is not None:
             result = json.dumps(value, cls=RestEncoder)
-            if isinstance(result, str):
-                result = result.encode('utf-8')
-            return result
+        else:
+            return None
+        if isinstance(result, str):
+            result = result.encode('utf-8')
+        if self.compression is not None and len(result) >= self.threshold:
+            result = compress(result, self.compression, self.level)
+        return result
 
     def process_result_value(self, value, dialect):
         if value:
-            if isinstance(value, bytes):
-                value = value.decode('utf-8')
+            if not isinstance(value, (bytes, str)):
+                value = bytes(value)
+            stored = value
+            value = decompress(value)
+            if _JSON_OBJECT_START[type(value)].match(value):
+                deferred = DeferredRestObject(value)
+                if value is not stored:
+                    deferred.__dict__['_stored'] = stored
+                return deferred
             return RestResponse.loads(value)
         else:
             return RestResponse.parse({})
 
 
-def RESTResponse():
-    return RestResponseObj.as_mutable(RestResponseEncodedObj())
+class RestResponseJSONObj(types.TypeDecorator):
+    """
+    Stores values in the dialect's native JSON type, JSONB on PostgreSQL. Values are handed to the dialect's JSON
+    serializer as is; the default json.dumps encodes them with RestEncoder.
+    """
+    impl = types.JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.JSONB(none_as_null=True))
+        return dialect.type_descriptor(types.JSON(none_as_null=True))
+
+    def process_bind_param(self, value, dialect):
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value:
+            # rows are already decoded by the driver, wrap nested values on access only
+            return RestResponse.parse(value, lazy=True)
+        else:
+            return RestResponse.parse({})
+
+
+def RESTResponse(compression=None, level=None, threshold=1024):
+    return RestResponseObj.as_mutable(
+        RestResponseEncodedObj(compression=compression, level=level, threshold=threshold)
+    )
+
+
+def RESTResponseJSON():
+    return RestResponseObj.as_mutable(RestResponseJSONObj())
+
+
+def _json_path(value, path):
+    parts = ['$']
+    node = value
+    for key in path:
+        if isinstance(node, list):
+            parts.append('[%d]' % key)
+            node = list.__getitem__(node, key)
+        else:
+            parts.append('."%s"' % key)
+            node = dict.get(node, key)
+    return ''.join(parts)
+
+
+def _addressable(dialect, path):
+    # SQLite JSON paths quote keys but cannot escape a quote inside them
+    return dialect.name != 'sqlite' or not any(isinstance(key, str) and '"' in key for key in path)
+
+
+def _encode_changes(changes):
+    # the JSON functions reject NaN and Infinity, None when a value needs them
+    try:
+        return [None if op == 'remove' else json.dumps(new_value, cls=RestEncoder, allow_nan=False)
+                for op, path, new_value in changes]
+    except ValueError:
+        return None
+
+
+def _apply_change(dialect, expr, value, op, path, new_value, encoded):
+    if not path:
+        return literal(new_value, type_=expr.type)
+    if dialect.name == 'postgresql':
+        keys = literal([str(key) for key in path], postgresql.ARRAY(types.Text))
+        if op == 'remove':
+            return expr.op('#-')(keys)
+        return func.jsonb_set(expr, keys, cast(literal(encoded), postgresql.JSONB), True)
+    if op == 'remove':
+        return func.json_remove(expr, _json_path(value, path))
+    return func.json_set(expr, _json_path(value, path), func.json(encoded))
+
+
+def partial_update(session, instance, key):
+    """
+    Write the changes tracked on `instance.<key>` (see RestResponseObj.diff) as path-targeted json_set/jsonb_set
+    updates instead of rewriting the whole value. The attribute is then marked clean and committed, so the next
+    flush does not write it again. When a changed path cannot be addressed (SQLite keys containing a double quote)
+    or a changed value can not be encoded as strict JSON (NaN, Infinity) the whole value is written instead. Returns
+    False, leaving the change to the next flush, on dialects other than SQLite and PostgreSQL and when the attribute
+    does not hold a RestObject or RestList.
+    """
+    value = getattr(instance, key)
+    if not isinstance(value, RestResponseObj):
+        return False
+    mapper = inspect(instance).mapper
+    column = mapper.columns[key]
+    dialect = session.get_bind(mapper=mapper).dialect
+    if dialect.name not in ('sqlite', 'postgresql'):
+        return False
+
+    changes = value.diff()
+    encoded = _encode_changes(changes)
+    if encoded is None or not all(_addressable(dialect, path) for op, path, new_value in changes):
+        changes, encoded = [('replace', (), value)], [None]
+    if changes:
+        expr = column
+        for (op, path, new_value), change in zip(changes, encoded):
+            expr = _apply_change(dialect, expr, value, op, path, new_value, change)
+        criteria = [c == v for c, v in zip(mapper.primary_key, mapper.primary_key_from_instance(instance))]
+        with session.no_autoflush:
+            # an autoflush would write the whole value before the targeted update
+            session.execute(update(column.table).where(and_(*criteria)).values({column.name: expr}))
+    value.mark_clean()
+    set_committed_value(instance, key, value)
+    return True
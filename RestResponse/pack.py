@@ -0,0 +1,290 @@
+"""
+Compact binary encoding of RestObject/RestList trees in the MessagePack format. bytes are stored as raw binary and
+datetime, date, Decimal, callables and integers beyond 64 bits as extension types, so unpackb returns the same tree
+packb was given without any `__binary__: ` style sentinel strings.
+
+The `msgpack` package is used when installed, otherwise the pure Python implementation below. Both produce the
+same bytes.
+"""
+import struct
+from datetime import datetime, date
+from decimal import Decimal
+
+from RestResponse import utils
+from RestResponse.objects import RestObject, RestList, _encode_hook
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+EXT_DATETIME = 1
+EXT_DATE = 2
+EXT_DECIMAL = 3
+EXT_CALLABLE = 4
+EXT_INT = 5
+
+_DOUBLE = struct.Struct('>d')
+_FLOAT = struct.Struct('>f')
+# (length/value struct, first byte) per header size
+_UINT = ((struct.Struct('>B'), 0xcc), (struct.Struct('>H'), 0xcd), (struct.Struct('>I'), 0xce),
+         (struct.Struct('>Q'), 0xcf))
+_INT = ((struct.Struct('>b'), 0xd0), (struct.Struct('>h'), 0xd1), (struct.Struct('>i'), 0xd2),
+        (struct.Struct('>q'), 0xd3))
+_FIXEXT = {1: 0xd4, 2: 0xd5, 4: 0xd6, 8: 0xd7, 16: 0xd8}
+
+
+def _ext(obj):
+    """
+    (type code, payload) for values stored as extension types, None for anything else
+    """
+    if isinstance(obj, datetime):
+        return EXT_DATETIME, obj.isoformat().encode('ascii')
+    elif isinstance(obj, date):
+        return EXT_DATE, obj.isoformat().encode('ascii')
+    elif isinstance(obj, Decimal):
+        return EXT_DECIMAL, str(obj).encode('ascii')
+    elif isinstance(obj, int) and not isinstance(obj, bool):
+        return EXT_INT, str(obj).encode('ascii')
+    elif callable(obj):
+        return EXT_CALLABLE, utils._encode_callable(obj).encode('utf-8')
+    return None
+
+
+def _from_ext(code, data):
+    data = bytes(data)
+    if code == EXT_DATETIME:
+        return datetime.fromisoformat(data.decode('ascii'))
+    elif code == EXT_DATE:
+        return date.fromisoformat(data.decode('ascii'))
+    elif code == EXT_DECIMAL:
+        return Decimal(data.decode('ascii'))
+    elif code == EXT_INT:
+        return int(data)
+    elif code == EXT_CALLABLE:
+        return utils._decode_callable(data.decode('utf-8'))
+    raise ValueError('Unknown extension type %d' % code)
+
+
+def _header(size, fix, fix_max, formats):
+    if size < fix_max:
+        return bytes((fix | size,))
+    for fmt, first in formats:
+        if size < 1 << (8 * fmt.size):
+            return bytes((first,)) + fmt.pack(size)
+    raise ValueError('Object too large to pack: %d' % size)
+
+
+_STR = ((struct.Struct('>B'), 0xd9), (struct.Struct('>H'), 0xda), (struct.Struct('>I'), 0xdb))
+_BIN = ((struct.Struct('>B'), 0xc4), (struct.Struct('>H'), 0xc5), (struct.Struct('>I'), 0xc6))
+_ARRAY = ((struct.Struct('>H'), 0xdc), (struct.Struct('>I'), 0xdd))
+_MAP = ((struct.Struct('>H'), 0xde), (struct.Struct('>I'), 0xdf))
+_EXT = ((struct.Struct('>B'), 0xc7), (struct.Struct('>H'), 0xc8), (struct.Struct('>I'), 0xc9))
+
+
+def _pack_int(n, out):
+    if 0 <= n < 0x80 or -0x20 <= n < 0:
+        out.append(struct.pack('>b', n) if n < 0 else bytes((n,)))
+        return True
+    for fmt, first in (_UINT if n >= 0 else _INT):
+        bits = 8 * fmt.size
+        if (n < 1 << bits) if n >= 0 else (n >= -(1 << (bits - 1))):
+            out.append(bytes((first,)) + fmt.pack(n))
+            return True
+    return False
+
+
+def _pack_ext(code, data, out):
+    if len(data) in _FIXEXT:
+        out.append(bytes((_FIXEXT[len(data)], code)))
+    else:
+        out.append(_header(len(data), 0, 0, _EXT) + bytes((code,)))
+    out.append(data)
+
+
+def _pack(obj, out, default):
+    if obj is None:
+        out.append(b'\xc0')
+    elif obj is True:
+        out.append(b'\xc3')
+    elif obj is False:
+        out.append(b'\xc2')
+    elif isinstance(obj, str):
+        data = obj.encode('utf-8')
+        out.append(_header(len(data), 0xa0, 32, _STR))
+        out.append(data)
+    elif isinstance(obj, int) and _pack_int(obj, out):
+        pass
+    elif isinstance(obj, float):
+        out.append(b'\xcb' + _DOUBLE.pack(obj))
+    elif isinstance(obj, dict):
+        out.append(_header(len(obj), 0x80, 16, _MAP))
+        for key, value in obj.items():
+            _pack(key, out, default)
+            _pack(value, out, default)
+    elif isinstance(obj, (list, tuple)):
+        out.append(_header(len(obj), 0x90, 16, _ARRAY))
+        for item in obj:
+            _pack(item, out, default)
+    elif isinstance(obj, utils.BUFFER_TYPES):
+        out.append(_header(len(obj), 0, 0, _BIN))
+        out.append(obj)
+    else:
+        ext = _ext(obj)
+        if ext is not None:
+            _pack_ext(ext[0], ext[1], out)
+        else:
+            value = default(obj)
+            if value is obj:
+                raise TypeError('Object of type {0} can not be packed'.format(obj.__class__.__name__))
+            _pack(value, out, default)
+
+
+def _unpack_sized(buf, pos, fmt):
+    return fmt.unpack_from(buf, pos)[0], pos + fmt.size
+
+
+def _unpack_bytes(buf, pos, size):
+    # slices stop at the end of the buffer, a length running past it means the data is truncated
+    if pos + size > len(buf):
+        raise IndexError(pos + size)
+    return buf[pos:pos + size], pos + size
+
+
+def _unpack_items(buf, pos, size):
+    items = []
+    for _ in range(size):
+        item, pos = _unpack(buf, pos)
+        items.append(item)
+    return RestList._from_items(items), pos
+
+
+def _unpack_pairs(buf, pos, size):
+    pairs = []
+    for _ in range(size):
+        key, pos = _unpack(buf, pos)
+        value, pos = _unpack(buf, pos)
+        pairs.append((key, value))
+    try:
+        return RestObject._from_pairs(pairs), pos
+    except TypeError:
+        raise ValueError('RestResponse.unpackb map keys must be hashable')
+
+
+def _unpack(buf, pos):
+    first = buf[pos]
+    pos += 1
+    if first < 0x80:
+        return first, pos
+    elif first >= 0xe0:
+        return first - 0x100, pos
+    elif first < 0x90:
+        return _unpack_pairs(buf, pos, first & 0x0f)
+    elif first < 0xa0:
+        return _unpack_items(buf, pos, first & 0x0f)
+    elif first < 0xc0:
+        data, pos = _unpack_bytes(buf, pos, first & 0x1f)
+        return str(data, 'utf-8'), pos
+    elif first == 0xc0:
+        return None, pos
+    elif first == 0xc2:
+        return False, pos
+    elif first == 0xc3:
+        return True, pos
+    elif 0xc4 <= first <= 0xc6:
+        size, pos = _unpack_sized(buf, pos, _BIN[first - 0xc4][0])
+        data, pos = _unpack_bytes(buf, pos, size)
+        return bytes(data), pos
+    elif 0xc7 <= first <= 0xc9:
+        size, pos = _unpack_sized(buf, pos, _EXT[first - 0xc7][0])
+        code = struct.unpack_from('>b', buf, pos)[0]
+        data, pos = _unpack_bytes(buf, pos + 1, size)
+        return _from_ext(code, data), pos
+    elif first == 0xca:
+        return _unpack_sized(buf, pos, _FLOAT)
+    elif first == 0xcb:
+        return _unpack_sized(buf, pos, _DOUBLE)
+    elif 0xcc <= first <= 0xcf:
+        return _unpack_sized(buf, pos, _UINT[first - 0xcc][0])
+    elif 0xd0 <= first <= 0xd3:
+        return _unpack_sized(buf, pos, _INT[first - 0xd0][0])
+    elif 0xd4 <= first <= 0xd8:
+        code = struct.unpack_from('>b', buf, pos)[0]
+        data, pos = _unpack_bytes(buf, pos + 1, 1 << (first - 0xd4))
+        return _from_ext(code, data), pos
+    elif 0xd9 <= first <= 0xdb:
+        size, pos = _unpack_sized(buf, pos, _STR[first - 0xd9][0])
+        data, pos = _unpack_bytes(buf, pos, size)
+        return str(data, 'utf-8'), pos
+    elif first in (0xdc, 0xdd):
+        size, pos = _unpack_sized(buf, pos, _ARRAY[first - 0xdc][0])
+        return _unpack_items(buf, pos, size)
+    elif first in (0xde, 0xdf):
+        size, pos = _unpack_sized(buf, pos, _MAP[first - 0xde][0])
+        return _unpack_pairs(buf, pos, size)
+    raise ValueError('Invalid first byte 0x%02x at position %d' % (first, pos - 1))
+
+
+def _packb_python(obj, opts=None):
+    out = []
+    _pack(obj, out, _encode_hook(opts or {}))
+    return b''.join(out)
+
+
+def _unpackb_python(buf):
+    buf = memoryview(buf).cast('B')
+    try:
+        value, pos = _unpack(buf, 0)
+    except (IndexError, struct.error):
+        raise ValueError('RestResponse.unpackb data is truncated')
+    if pos != len(buf):
+        raise ValueError('RestResponse.unpackb data has %d extra bytes' % (len(buf) - pos))
+    return value
+
+
+def _packb_msgpack(obj, opts=None):
+    default = _encode_hook(opts or {})
+
+    def _default(o):
+        ext = _ext(o)
+        if ext is not None:
+            return msgpack.ExtType(*ext)
+        value = default(o)
+        if value is o:
+            raise TypeError('Object of type {0} can not be packed'.format(o.__class__.__name__))
+        return value
+
+    try:
+        return msgpack.packb(obj, default=_default, use_bin_type=True, datetime=False)
+    except OverflowError:
+        # integers beyond 64 bits are only handled by the Python packer
+        return _packb_python(obj, opts)
+
+
+def _unpackb_msgpack(buf):
+    try:
+        return msgpack.unpackb(
+            buf, raw=False, strict_map_key=False, ext_hook=_from_ext, object_pairs_hook=RestObject._from_pairs,
+            list_hook=RestList._from_items
+        )
+    except (msgpack.ExtraData, msgpack.FormatError, msgpack.StackError, ValueError, TypeError) as e:
+        raise ValueError('RestResponse.unpackb data must be packed by RestResponse.packb: %s' % e)
+
+
+def packb(obj, opts=None):
+    """
+    Encode `obj` to bytes, `opts` being the encode options used for values without a native representation (e.g.
+    ApiModel)
+    """
+    if msgpack is not None:
+        return _packb_msgpack(obj, opts)
+    return _packb_python(obj, opts)
+
+
+def unpackb(buf):
+    """
+    Decode packb output back to RestObject/RestList trees
+    """
+    if msgpack is not None:
+        return _unpackb_msgpack(buf)
+    return _unpackb_python(buf)
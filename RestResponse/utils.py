@@ -1,34 +1,302 @@
 import base64
+import binascii
+import codecs
+import collections
+import functools
+import json
+import re
+import sys
 from decimal import Decimal
 from datetime import datetime, date
 import cloudpickle as pickle
+from dateutil import parser as dateutil_parser
+
+JSON_WHITESPACE = ' \t\n\r'
+
+
+BINARY_PREFIX = '__binary__: '
+CALLABLE_PREFIX = '__callable__: '
+# bytes-like values accepted wherever bytes are, encoded through the buffer protocol without copying
+BUFFER_TYPES = (bytes, bytearray, memoryview)
+# multiple of 3 so every chunk base64 encodes without padding
+BINARY_CHUNK_SIZE = 3 * 2 ** 14
+
+
+def _buffer_view(obj):
+    """
+    Flat, byte oriented memoryview of `obj`, only non-contiguous buffers are copied
+    """
+    view = memoryview(obj)
+    try:
+        return view.cast('B')
+    except TypeError:
+        return memoryview(view.tobytes())
+
+
+def _b64decode_suffix(value, prefix):
+    if isinstance(value, str):
+        # a2b_base64 reads ASCII str data in place, the slice is the only copy
+        return binascii.a2b_base64(value[len(prefix):])
+    return binascii.a2b_base64(_buffer_view(value)[len(prefix):])
+
+
+CALLABLE_CACHE_SIZE = 256
+# registered callables serialize as `__callable__: @<name>` instead of a pickle
+_callable_registry = {}
+_callable_names = {}
+_callable_registry_only = False
+
+
+def register_callable(func, name=None):
+    """
+    Serialize `func` by `name` (its module and qualified name by default) rather than as a pickle. Returns `func`, so
+    this can be used as a decorator.
+    """
+    if name is None:
+        name = '%s.%s' % (func.__module__, func.__qualname__)
+    unregister_callable(name)
+    _callable_registry[name] = func
+    _callable_names[func] = name
+    return func
+
+
+def unregister_callable(name):
+    func = _callable_registry.pop(name, None)
+    if func is not None:
+        _callable_names.pop(func, None)
+
+
+def set_callable_registry_only(enabled=True):
+    """
+    Only encode and decode registered callables. Unregistered callables raise TypeError when encoded and pickled
+    payloads raise ValueError instead of being unpickled.
+    """
+    global _callable_registry_only
+    _callable_registry_only = enabled
+
+
+def _pickle_callable(obj):
+    return CALLABLE_PREFIX + base64.b64encode(pickle.dumps(obj)).decode('utf-8')
+
+
+def _unpickle_callable(value):
+    return pickle.loads(_b64decode_suffix(value, CALLABLE_PREFIX))
+
+
+def _pickles_by_reference(obj):
+    """
+    Whether `obj` is a module-level function or class, which pickles as its import path. Its pickle does not
+    depend on its state, and unpickling returns `obj` itself, so both can be cached.
+    """
+    module = sys.modules.get(getattr(obj, '__module__', None) or '__main__')
+    qualname = getattr(obj, '__qualname__', None)
+    if module is None or module.__name__ == '__main__' or not isinstance(qualname, str) or '<locals>' in qualname:
+        return False
+    target = module
+    for name in qualname.split('.'):
+        target = getattr(target, name, None)
+    return target is obj
+
+
+_CacheInfo = collections.namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# pickles of module-level callables keyed by the callable. Other callables are pickled on every encode, their
+# closures, defaults and attributes may change between encodes
+_pickle_callable_cached = functools.lru_cache(maxsize=CALLABLE_CACHE_SIZE)(_pickle_callable)
+# module-level callables keyed by payload. Other payloads are unpickled into a fresh object on every decode, so
+# state changed through one decoded tree does not show in others
+_unpickled_callables = {}
+_unpickle_stats = {'hits': 0, 'misses': 0}
+
+
+def _unpickle_callable_cached(value):
+    func = _unpickled_callables.get(value)
+    if func is not None:
+        _unpickle_stats['hits'] += 1
+        return func
+    _unpickle_stats['misses'] += 1
+    func = _unpickle_callable(value)
+    if _pickles_by_reference(func):
+        if len(_unpickled_callables) >= CALLABLE_CACHE_SIZE:
+            # drop the oldest entry
+            del _unpickled_callables[next(iter(_unpickled_callables))]
+        _unpickled_callables[value] = func
+    return func
+
+
+def callable_cache_info():
+    return {
+        'encode': _pickle_callable_cached.cache_info(),
+        'decode': _CacheInfo(
+            _unpickle_stats['hits'], _unpickle_stats['misses'], CALLABLE_CACHE_SIZE, len(_unpickled_callables)
+        ),
+    }
+
+
+def callable_cache_clear():
+    _pickle_callable_cached.cache_clear()
+    _unpickled_callables.clear()
+    _unpickle_stats.update(hits=0, misses=0)
 
 
 def _decode_callable(value):
-    return pickle.loads(base64.b64decode(value.replace('__callable__: ', '')))
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    if value.startswith('@', len(CALLABLE_PREFIX)):
+        name = value[len(CALLABLE_PREFIX) + 1:]
+        try:
+            return _callable_registry[name]
+        except KeyError:
+            raise ValueError('Callable "%s" is not registered' % name)
+    if _callable_registry_only:
+        raise ValueError('Refusing to unpickle an unregistered callable')
+    return _unpickle_callable_cached(value)
 
 
 def _decode_binary(value):
-    return base64.b64decode(value.replace('__binary__: ', ''))
+    return _b64decode_suffix(value, BINARY_PREFIX)
 
 
 def _encode_callable(obj):
-    return '__callable__: %s' % base64.b64encode(pickle.dumps(obj)).decode('utf-8')
+    try:
+        name = _callable_names.get(obj)
+    except TypeError:
+        # unhashable callables are neither registered nor cached
+        name = None
+        if not _callable_registry_only:
+            return _pickle_callable(obj)
+    if name is not None:
+        return '%s@%s' % (CALLABLE_PREFIX, name)
+    if _callable_registry_only:
+        raise TypeError('Callable {0!r} is not registered'.format(obj))
+    if _pickles_by_reference(obj):
+        return _pickle_callable_cached(obj)
+    return _pickle_callable(obj)
 
 
 def _encode_binary(obj):
-    return '__binary__: %s' % base64.b64encode(obj).decode('utf-8')
+    return BINARY_PREFIX + binascii.b2a_base64(_buffer_view(obj), newline=False).decode('ascii')
+
+
+def iter_encode_binary(obj, chunk_size=BINARY_CHUNK_SIZE):
+    """
+    Yield the `__binary__: ` encoding of `obj` piece by piece, so only `chunk_size` bytes are base64 encoded at a
+    time
+    """
+    chunk_size = max(chunk_size - chunk_size % 3, 3)
+    view = _buffer_view(obj)
+    yield BINARY_PREFIX
+    for i in range(0, len(view), chunk_size):
+        yield binascii.b2a_base64(view[i:i + chunk_size], newline=False).decode('ascii')
 
 
-def istext(s, text_characters="".join(map(chr, range(32, 127))) + "\n\r\t\b", threshold=0.30):
+def _normalize_datetime(d, format):
+    return datetime.strptime(d.strftime(format), format)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_datetime(value, format):
+    if format.startswith('%Y-%m-%d'):
+        # values in an ISO ordered target format read the same through dateutil, normalizing would be a no-op
+        try:
+            return datetime.strptime(value, format)
+        except ValueError:
+            pass
+    try:
+        d = datetime.fromisoformat(value)
+    except ValueError:
+        d = dateutil_parser.parse(value)
+    return _normalize_datetime(d, format)
+
+
+def parse_datetime(value, format='%Y-%m-%dT%H:%M:%SZ'):
+    """
+    Parse `value` into a datetime normalized through `format`. Strings try `format` itself (only for ISO ordered
+    formats, others may read day and month differently than dateutil) and datetime.fromisoformat before falling
+    back to dateutil, and recent conversions are memoized (datetimes are immutable).
+    """
+    if isinstance(value, str):
+        return _parse_datetime(value, format)
+    return _normalize_datetime(dateutil_parser.parse(value), format)
+
+
+def parse_date(value, format='%Y-%m-%d'):
+    return parse_datetime(value, format=format).date()
+
+
+TEXT_CHARACTERS = "".join(map(chr, range(32, 127))) + "\n\r\t\b"
+_TEXT_TABLE = str.maketrans("", "", TEXT_CHARACTERS)
+_UTF8_CONTINUATION_BYTES = bytes(range(0x80, 0xc0))
+# deleting these leaves one byte per non-text character of the UTF-8 decoded string
+_NON_TEXT_DELETE = TEXT_CHARACTERS.encode('ascii') + _UTF8_CONTINUATION_BYTES
+
+
+def istext(s, text_characters=TEXT_CHARACTERS, threshold=0.30):
     """
     Helper to attempt support of serializing binary text by base64 encoding `s` if this returns False
 
     Credit: https://www.oreilly.com/library/view/python-cookbook-2nd/0596007973/ch01s12.html
     """
-    if isinstance(s, bytes):
+    if text_characters != TEXT_CHARACTERS:
+        return _istext(s, text_characters, threshold)
+
+    if isinstance(s, str):
+        if not s.isascii():
+            return _istext(s, text_characters, threshold)
+        s = s.encode('ascii')
+        length = len(s)
+    elif not isinstance(s, bytes) or len(s) > BINARY_CHUNK_SIZE:
+        return _istext_buffer(s, threshold)
+    elif s.isascii():
+        length = len(s)
+    else:
         try:
-            s = s.decode('utf-8')
+            s.decode('utf-8')
+        except UnicodeDecodeError:
+            return False
+        # count characters rather than bytes, matching the ratio of the decoded string
+        length = len(s.translate(None, _UTF8_CONTINUATION_BYTES))
+
+    if b'\0' in s:
+        return False
+    if not s:
+        return True
+
+    return len(s.translate(None, _NON_TEXT_DELETE)) / length <= threshold
+
+
+def _istext_buffer(s, threshold):
+    """
+    `istext` for bytearray/memoryview and large bytes values, classified in `BINARY_CHUNK_SIZE` slices so no full
+    size copy or decoded string is ever made
+    """
+    view = _buffer_view(s)
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    length = non_text = 0
+    for i in range(0, len(view), BINARY_CHUNK_SIZE):
+        chunk = view[i:i + BINARY_CHUNK_SIZE].tobytes()
+        if b'\0' in chunk:
+            return False
+        try:
+            decoder.decode(chunk)
+        except UnicodeDecodeError:
+            return False
+        length += len(chunk.translate(None, _UTF8_CONTINUATION_BYTES))
+        non_text += len(chunk.translate(None, _NON_TEXT_DELETE))
+    try:
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+
+    if not length:
+        return True
+    return non_text / length <= threshold
+
+
+def _istext(s, text_characters, threshold):
+    if not isinstance(s, str):
+        try:
+            s = str(s, 'utf-8')
         except UnicodeDecodeError:
             return False
 
@@ -37,12 +305,23 @@ def istext(s, text_characters="".join(map(chr, range(32, 127))) + "\n\r\t\b", th
     if not s:
         return True
 
-    t = s.translate(str.maketrans("", "", text_characters))
+    if text_characters == TEXT_CHARACTERS:
+        t = s.translate(_TEXT_TABLE)
+    else:
+        t = s.translate(str.maketrans("", "", text_characters))
 
     # s is 'text' if less than 30% of its characters are non-text ones:
     return len(t) / len(s) <= threshold
 
 
+def istext_many(items, text_characters=TEXT_CHARACTERS, threshold=0.30):
+    """
+    Classify many str/bytes values at once, e.g. every element of a list being encoded. Returns a list of istext
+    results in the order of `items`
+    """
+    return [istext(item, text_characters, threshold) for item in items]
+
+
 def encode_item(item, encode_binary=True, encode_callable=True, **kwargs):
     if isinstance(item, Decimal):
         return float(item)
@@ -58,29 +337,257 @@ def encode_item(item, encode_binary=True, encode_callable=True, **kwargs):
             return item.isoformat()
     if encode_callable and callable(item):
         return _encode_callable(item)
-    elif (
-        encode_binary and isinstance(item, bytes) and not istext(item)
-    ):
-        return _encode_binary(item)
-    elif isinstance(item, bytes) and istext(item):
-        return item.decode('utf-8')
+    elif isinstance(item, BUFFER_TYPES):
+        # classify once, text is decoded and binary base64 encoded when enabled
+        if istext(item):
+            return str(item, 'utf-8')
+        elif encode_binary:
+            return _encode_binary(item)
     return item
 
 
 def decode_item(item, decode_binary=True, decode_callable=True, **kwargs):
     if isinstance(item, Decimal):
         return float(item)
-    elif decode_callable and isinstance(item, str) and item.startswith('__callable__: '):
+    elif decode_callable and isinstance(item, str) and item.startswith(CALLABLE_PREFIX):
         return _decode_callable(item)
     elif decode_callable and isinstance(item, bytes) and item.startswith(b'__callable__: '):
-        return _decode_callable(item.decode('utf-8'))
-    elif decode_binary and isinstance(item, str) and item.startswith('__binary__: '):
+        return _decode_callable(item)
+    elif decode_binary and isinstance(item, str) and item.startswith(BINARY_PREFIX):
         item = _decode_binary(item)
     elif decode_binary and isinstance(item, bytes) and item.startswith(b'__binary__: '):
-        item = _decode_binary(item.decode('utf-8'))
+        item = _decode_binary(item)
     try:
         if isinstance(item, bytes):
             item = item.decode('utf-8')
     except UnicodeDecodeError:
         pass
     return item
+
+
+class InternTable(object):
+    """
+    Bounded table deduplicating short repeated strings, e.g. status enums and country codes. Strings of at most
+    `max_length` characters are added until the table holds `max_size` of them, after which only strings already in
+    the table are deduplicated.
+    """
+    def __init__(self, max_size=16384, max_length=32):
+        self.max_size = max_size
+        self.max_length = max_length
+        self._strings = {}
+
+    def __call__(self, value):
+        if len(value) > self.max_length:
+            return value
+        strings = self._strings
+        try:
+            return strings[value]
+        except KeyError:
+            if len(strings) < self.max_size:
+                strings[value] = value
+            return value
+
+    def __len__(self):
+        return len(self._strings)
+
+    def clear(self):
+        self._strings.clear()
+
+
+# shared by loads(intern_values=True) calls, so values repeated across responses are deduplicated too
+INTERN_TABLE = InternTable()
+
+
+# characters the skip scanner stops at outside and inside strings
+_SKIP_VALUE = re.compile(r'["\[\]{}]')
+_SKIP_STRING = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[\s,:\[\]{}"]')
+
+
+class JSONStreamReader(object):
+    """
+    Incrementally walks a JSON document read from a file object or an iterable of str/bytes chunks, decoding only
+    the values found at a path. Only the undecoded tail of the input is buffered, so memory is bounded by the
+    largest value decoded rather than the whole document. Values off the path are scanned past without being
+    decoded, checking only that their brackets and strings are balanced.
+
+    `path` uses dotted keys, with `item` matching every element of an array, e.g. `item` yields the elements of a
+    top-level array and `data.items.item` yields the elements of the array at `{"data": {"items": [...]}}`.
+    """
+    def __init__(self, source, decoder=None, chunk_size=65536):
+        if hasattr(source, 'read'):
+            source = self._read_chunks(source, chunk_size)
+        self.chunks = iter(source)
+        self.decoder = decoder or json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    @staticmethod
+    def _read_chunks(fp, chunk_size):
+        while True:
+            chunk = fp.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def _more(self, size=1):
+        """
+        Read at least `size` more characters, returning False once the input is exhausted
+        """
+        if self.eof:
+            return False
+        if self.pos > len(self.buffer) // 2:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunks = []
+        read = 0
+        while read < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                chunks.append(self.utf8.decode(b'', final=True))
+                self.eof = True
+                break
+            if isinstance(chunk, (bytes, bytearray, memoryview)):
+                chunk = self.utf8.decode(chunk)
+            chunks.append(chunk)
+            read += len(chunk)
+        self.buffer += ''.join(chunks)
+        return read > 0 or not self.eof
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in JSON_WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._more():
+                return ''
+
+    def consume(self, expected):
+        char = self.peek()
+        if char not in expected:
+            raise ValueError('Expecting {0!r} at position {1}, found {2!r}'.format(expected, self.pos, char))
+        self.pos += 1
+        return char
+
+    def decode(self):
+        """
+        Decode the next value. It is read until complete before decoding, so the decoder's hooks run once per
+        object however the input is chunked.
+        """
+        if self.peek() in '[{"':
+            self._scan(keep=True)
+        else:
+            self._scalar_end()
+        value, self.pos = self.decoder.raw_decode(self.buffer, self.pos)
+        return value
+
+    def skip(self):
+        """
+        Move past the next value without decoding it
+        """
+        if self.peek() not in '[{"':
+            # scalars are small, and decoding them never runs the decoder's hooks
+            self.decode()
+            return
+        self.pos = self._scan(keep=False)
+
+    def _scalar_end(self):
+        """
+        Offset of the end of the number or literal at self.pos, reading until a character that can not continue it
+        """
+        pos = self.pos
+        while True:
+            match = _SCALAR_END.search(self.buffer, pos)
+            if match is not None:
+                return match.start()
+            pos = len(self.buffer)
+            offset = self.pos
+            if not self._more():
+                return pos
+            # _more drops the consumed head of the buffer
+            pos -= offset - self.pos
+
+    def _scan(self, keep):
+        """
+        Offset just past the container or string at self.pos, checking only that brackets and strings balance. With
+        `keep` the value stays buffered from self.pos, otherwise self.pos follows the scan so the scanned part can
+        be dropped from the buffer.
+        """
+        depth = 0
+        in_string = False
+        pos = self.pos
+        while True:
+            buffer = self.buffer
+            while True:
+                match = (_SKIP_STRING if in_string else _SKIP_VALUE).search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                char = match.group()
+                pos = match.end()
+                if char == '\\':
+                    if pos == len(buffer):
+                        # the escaped character is in the next chunk
+                        pos -= 1
+                        break
+                    pos += 1
+                elif char == '"':
+                    in_string = not in_string
+                    if not in_string and not depth:
+                        return pos
+                elif char in '[{':
+                    depth += 1
+                else:
+                    depth -= 1
+                    if not depth:
+                        return pos
+            if not keep:
+                self.pos = pos
+            offset = self.pos
+            if not self._more():
+                raise ValueError('Unterminated value at position {0}'.format(pos))
+            pos -= offset - self.pos
+
+    def iter_path(self, path):
+        for value in self._walk(path.split('.') if path else []):
+            yield value
+        if self.peek():
+            raise ValueError('Extra data at position {0}'.format(self.pos))
+
+    def _walk(self, keys):
+        if not keys:
+            yield self.decode()
+            return
+
+        key, keys = keys[0], keys[1:]
+        char = self.peek()
+        if key == 'item' and char == '[':
+            self.pos += 1
+            if self.peek() == ']':
+                self.pos += 1
+                return
+            while True:
+                for value in self._walk(keys):
+                    yield value
+                if self.consume(',]') == ']':
+                    return
+        elif char == '{':
+            self.pos += 1
+            if self.peek() == '}':
+                self.pos += 1
+                return
+            while True:
+                name = self.decode()
+                self.consume(':')
+                if name == key:
+                    for value in self._walk(keys):
+                        yield value
+                else:
+                    self.skip()
+                if self.consume(',}') == '}':
+                    return
+        else:
+            self.skip()
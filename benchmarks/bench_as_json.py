@@ -0,0 +1,63 @@
+"""
+ApiModel._as_json benchmark: single pass to_primitive vs json.dumps + json.loads round trip
+
+    $ PYTHONPATH=. python benchmarks/bench_as_json.py
+"""
+import json
+import timeit
+from datetime import datetime
+
+from RestResponse import ApiCollection, ApiModel
+from RestResponse.objects import _encode_hook
+
+
+class Ref(ApiModel):
+    def __init__(self, data=None):
+        self._data = data
+
+    @property
+    def id(self):
+        return self._get_int(self._data.id)
+
+    @id.setter
+    def id(self, id):
+        self._data.id = self._set_int(id)
+
+    @property
+    def created(self):
+        return self._get_datetime(self._data.created)
+
+    @created.setter
+    def created(self, created):
+        self._data.created = self._set_datetime(created)
+
+    @property
+    def tags(self):
+        return self._data.tags
+
+    @tags.setter
+    def tags(self, tags):
+        self._data.tags = tags
+
+
+MODEL = Ref({'id': 1, 'created': datetime(2020, 1, 1), 'tags': [{'name': 'tag %s' % x} for x in range(50)]})
+COLLECTION = ApiCollection(Ref, [MODEL._data] * 2000)
+
+
+def round_trip(data, opts):
+    return json.loads(json.dumps(data, default=_encode_hook(opts)))
+
+
+def main(number=5):
+    for label, data, opts, as_json in (
+        ('ApiModel', MODEL._data, MODEL.__opts__, lambda: MODEL._as_json),
+        ('ApiCollection', COLLECTION, COLLECTION.__opts__, lambda: COLLECTION._as_json),
+    ):
+        assert as_json() == round_trip(data, opts)
+        old = min(timeit.repeat(lambda: round_trip(data, opts), number=10, repeat=number))
+        new = min(timeit.repeat(as_json, number=10, repeat=number))
+        print('{0:>14}: round trip {1:.4f}s  to_primitive {2:.4f}s  ({3:.1f}x)'.format(label, old, new, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+RESTResponse() storage benchmark: stored size and bind/result throughput for each compression codec
+
+    $ PYTHONPATH=. python benchmarks/bench_compression.py
+"""
+import timeit
+from datetime import datetime
+
+import RestResponse
+from RestResponse.orm import sqlalchemy as orm
+
+
+PAYLOADS = {
+    'api response': RestResponse.parse({'results': [{
+        'id': x,
+        'name': 'user %s' % x,
+        'email': 'user%s@example.com' % x,
+        'created': datetime(2020, 1, 1, 12, 0, 0),
+        'address': {'city': 'Gwenborough', 'zipcode': '92998-3874', 'geo': {'lat': -37.3159, 'lng': 81.1496}},
+        'tags': ['a', 'b', 'c'],
+    } for x in range(5000)]}),
+    'small object': RestResponse.parse({'id': 1, 'name': 'user', 'tags': ['a', 'b']}),
+}
+SETTINGS = [(None, None), ('zlib', 1), ('zlib', 6), ('lzma', 1)]
+if orm.zstandard is not None:
+    SETTINGS += [('zstd', 3)]
+
+
+def main(number=5):
+    for label, data in PAYLOADS.items():
+        plain = orm.RestResponseEncodedObj().process_bind_param(data, None)
+        expected = RestResponse.loads(plain)
+        for compression, level in SETTINGS:
+            column_type = orm.RestResponseEncodedObj(compression=compression, level=level)
+            stored = column_type.process_bind_param(data, None)
+            assert column_type.process_result_value(stored, None) == expected
+            bind = min(timeit.repeat(lambda: column_type.process_bind_param(data, None), number=1, repeat=number))
+            result = min(timeit.repeat(
+                lambda: len(column_type.process_result_value(stored, None)), number=1, repeat=number
+            ))
+            print('{0:>12} {1:>5}/{2!s:<4}: {3:>8} bytes ({4:6.1%})  bind {5:6.1f} MB/s  load {6:6.1f} MB/s'.format(
+                label, compression or 'none', level, len(stored), len(stored) / len(plain),
+                len(plain) / bind / 1e6, len(plain) / result / 1e6
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+ApiModel datetime parsing benchmark: exact format / fromisoformat / memoized fast path vs dateutil for every value
+
+    $ PYTHONPATH=. python benchmarks/bench_datetime.py
+"""
+import timeit
+from datetime import datetime, timedelta
+
+from dateutil import parser as dateutil_parser
+
+from RestResponse import utils
+
+FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+START = datetime(2020, 1, 1)
+UNIQUE = {
+    'exact format': [(START + timedelta(seconds=x)).strftime(FORMAT) for x in range(20000)],
+    'isoformat': [(START + timedelta(seconds=x, microseconds=x)).isoformat() for x in range(20000)],
+}
+REPEATED = {label: values[:100] * 200 for label, values in UNIQUE.items()}
+
+
+def dateutil_path(value):
+    return datetime.strptime(dateutil_parser.parse(value).strftime(FORMAT), FORMAT)
+
+
+def fast_path(values):
+    utils._parse_datetime.cache_clear()
+    return [utils.parse_datetime(value, FORMAT) for value in values]
+
+
+def main(number=3):
+    for kind, payloads in (('unique', UNIQUE), ('repeated', REPEATED)):
+        for label, values in payloads.items():
+            assert fast_path(values) == [dateutil_path(value) for value in values]
+            old = min(timeit.repeat(lambda: [dateutil_path(value) for value in values], number=1, repeat=number))
+            new = min(timeit.repeat(lambda: fast_path(values), number=1, repeat=number))
+            print('{0:>8} {1:>12} x{2}: dateutil {3:.3f}s  fast path {4:.3f}s  ({5:.1f}x)'.format(
+                kind, label, len(values), old, new, old / new
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+loads interning benchmark: traced memory of a 1M record payload with and without intern_values, and the key
+strings kept by a cache of separately loaded responses
+
+    $ PYTHONPATH=. python benchmarks/bench_interning.py
+"""
+import gc
+import json
+import timeit
+import tracemalloc
+
+import RestResponse
+
+STATUSES = ['active', 'inactive', 'pending', 'suspended']
+COUNTRIES = ['US', 'GB', 'DE', 'FR', 'NL', 'SE', 'JP', 'BR', 'IN', 'CA']
+
+
+def payload(records):
+    return json.dumps({'results': [{
+        'id': x,
+        'status': STATUSES[x % len(STATUSES)],
+        'country': COUNTRIES[x % len(COUNTRIES)],
+        'plan': 'enterprise' if x % 3 else 'free',
+        'tags': ['beta', 'newsletter'],
+    } for x in range(records)]})
+
+
+def traced(func):
+    gc.collect()
+    tracemalloc.start()
+    data = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return data, size
+
+
+def main(records=1000000, responses=10000, number=1):
+    text = payload(records)
+    for mode, kwargs in [('RestObject', {}), ('compact', {'records': 'compact'})]:
+        baseline = None
+        for intern_values in (False, True):
+            RestResponse.utils.INTERN_TABLE.clear()
+            size = traced(lambda: RestResponse.loads(text, intern_values=intern_values, **kwargs))[1]
+            baseline = baseline or size
+            load = min(timeit.repeat(
+                lambda: RestResponse.loads(text, intern_values=intern_values, **kwargs), number=1, repeat=number
+            ))
+            print('{0:>10} intern_values={1!s:<5}: {2:7.1f} MB ({3:6.1%}) {4:5d} bytes/record  load {5:.3f}s'.format(
+                mode, intern_values, size / 1e6, size / baseline, size // records, load
+            ))
+
+    # a cache of small responses, each decoded separately
+    texts = [payload(5) for _ in range(responses)]
+    cache, size = traced(lambda: [RestResponse.loads(x) for x in texts])
+    keys = {id(key) for response in cache for record in response.results for key in record}
+    print('{0} cached responses: {1:.1f} MB, {2} distinct key objects for {3} records'.format(
+        responses, size / 1e6, len(keys), responses * 5
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+JSON backend benchmark: dumps/pretty_print for each registered backend on a large nested payload
+
+    $ PYTHONPATH=. python benchmarks/bench_json_backend.py
+"""
+import timeit
+from datetime import datetime
+from decimal import Decimal
+
+import RestResponse
+from RestResponse.objects import JSON_BACKENDS
+
+
+DATA = RestResponse.parse([{
+    'id': x,
+    'name': 'user %s' % x,
+    'created': datetime(2020, 1, 1, 12, 0, 0),
+    'balance': Decimal('10.5'),
+    'address': {'city': 'Gwenborough', 'geo': {'lat': -37.3159, 'lng': 81.1496}},
+    'tags': ['a', 'b', 'c'],
+} for x in range(20000)])
+
+
+def main(number=3):
+    expected = None
+    try:
+        for backend in sorted(JSON_BACKENDS):
+            RestResponse.RestResponse.set_json_backend(backend)
+            output = (RestResponse.dumps(DATA), DATA.pretty_print())
+            expected = expected or output
+            compact = min(timeit.repeat(lambda: RestResponse.dumps(DATA), number=1, repeat=number))
+            pretty = min(timeit.repeat(lambda: DATA.pretty_print(), number=1, repeat=number))
+            print('{0:>10}: dumps {1:.3f}s  pretty_print {2:.3f}s  identical={3}'.format(
+                backend, compact, pretty, output == expected
+            ))
+    finally:
+        RestResponse.RestResponse.set_json_backend('stdlib')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+packb/unpackb benchmark: size and speed against dumps/loads, for the pure Python and msgpack (when installed) packers
+
+    $ PYTHONPATH=. python benchmarks/bench_pack.py
+"""
+import os
+import timeit
+from datetime import datetime
+from decimal import Decimal
+
+import RestResponse
+from RestResponse import pack
+
+
+PAYLOADS = {
+    'records': RestResponse.parse([{
+        'id': x,
+        'name': 'user %s' % x,
+        'created': datetime(2020, 1, 1, 12, 0, 0),
+        'balance': Decimal('10.5'),
+        'address': {'city': 'Gwenborough', 'geo': {'lat': -37.3159, 'lng': 81.1496}},
+        'tags': ['a', 'b', 'c'],
+    } for x in range(5000)]),
+    'binary': RestResponse.parse({'files': [{'id': x, 'content': os.urandom(64 * 1024)} for x in range(50)]}),
+}
+PACKERS = [('python', pack._packb_python, pack._unpackb_python)]
+if pack.msgpack is not None:
+    PACKERS += [('msgpack', pack._packb_msgpack, pack._unpackb_msgpack)]
+
+
+def best(func, number):
+    return min(timeit.repeat(func, number=1, repeat=number))
+
+
+def main(number=3):
+    for label, data in PAYLOADS.items():
+        text = RestResponse.dumps(data)
+        encode, decode = best(lambda: RestResponse.dumps(data), number), best(lambda: RestResponse.loads(text), number)
+        print('{0:>8} {1:>8}: {2:>9} bytes  encode {3:.3f}s  decode {4:.3f}s'.format(
+            label, 'json', len(text.encode('utf-8')), encode, decode
+        ))
+        for name, packb, unpackb in PACKERS:
+            packed = packb(data)
+            assert unpackb(packed) == data
+            encode, decode = best(lambda: packb(data), number), best(lambda: unpackb(packed), number)
+            print('{0:>8} {1:>8}: {2:>9} bytes  encode {3:.3f}s  decode {4:.3f}s'.format(
+                label, name, len(packed), encode, decode
+            ))
+
+
+if __name__ == '__main__':
+    main()
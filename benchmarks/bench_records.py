@@ -0,0 +1,49 @@
+"""
+loads(records='compact') benchmark: traced memory, load time and attribute access against RestObjects
+
+    $ PYTHONPATH=. python benchmarks/bench_records.py
+"""
+import gc
+import timeit
+import tracemalloc
+
+import RestResponse
+
+
+TEXT = RestResponse.dumps({'results': [{
+    'id': x,
+    'name': 'user %s' % x,
+    'email': 'user%s@example.com' % x,
+    'active': bool(x % 2),
+    'score': x * 0.5,
+    'address': {'city': 'Gwenborough', 'zipcode': '92998-3874', 'geo': {'lat': -37.3159, 'lng': 81.1496}},
+    'tags': ['a', 'b'],
+} for x in range(100000)]})
+MODES = [('RestObject', {}), ('lazy', {'lazy': True}), ('compact', {'records': 'compact'})]
+
+
+def traced(kwargs):
+    gc.collect()
+    tracemalloc.start()
+    data = RestResponse.loads(TEXT, **kwargs)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return data, size
+
+
+def main(number=3):
+    baseline = None
+    for label, kwargs in MODES:
+        data, size = traced(kwargs)
+        baseline = baseline or size
+        results = data.results
+        load = min(timeit.repeat(lambda: RestResponse.loads(TEXT, **kwargs), number=1, repeat=number))
+        access = min(timeit.repeat(lambda: [x.address.city for x in results], number=1, repeat=number))
+        print('{0:>10}: {1:6.1f} MB ({2:6.1%}) {3:5d} bytes/record  load {4:.3f}s  access {5:.3f}s'.format(
+            label, size / 1e6, size / baseline, size // len(results), load, access
+        ))
+        data = results = None
+
+
+if __name__ == '__main__':
+    main()
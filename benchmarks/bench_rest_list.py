@@ -0,0 +1,33 @@
+"""
+RestList construction benchmark: bulk __init__/extend vs per-element append
+
+    $ PYTHONPATH=. python benchmarks/bench_rest_list.py
+"""
+import timeit
+
+from RestResponse import RestList
+
+
+ITEMS = [{'id': x, 'name': 'user %s' % x, 'tags': ['a', 'b']} for x in range(100000)]
+PRIMITIVES = list(range(100000))
+
+
+def append_each(items):
+    lst = RestList()
+    for item in items:
+        lst.append(item)
+    return lst
+
+
+def main(number=3):
+    for label, items in (('dicts', ITEMS), ('primitives', PRIMITIVES)):
+        per_element = min(timeit.repeat(lambda: append_each(items), number=1, repeat=number))
+        bulk = min(timeit.repeat(lambda: RestList(items), number=1, repeat=number))
+        extend = min(timeit.repeat(lambda: RestList().extend(items), number=1, repeat=number))
+        print('{0:>10} x{1}: append {2:.3f}s  __init__ {3:.3f}s  extend {4:.3f}s  ({5:.1f}x)'.format(
+            label, len(items), per_element, bulk, extend, per_element / bulk
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,8 @@
-from RestResponse import ApiModel, ApiCollection
-from RestResponse.orm.sqlalchemy import RESTResponse
+from RestResponse import (
+    ApiModel, ApiCollection, Field, IntField, FloatField, StringField, BoolField, DateTimeField, DateField, ModelField,
+    CollectionField
+)
+from RestResponse.orm.sqlalchemy import RESTResponse, RESTResponseJSON
 from tests import test_db
 
 
@@ -13,6 +16,11 @@ class DBModel(test_db.Model):
         self.data = data
 
 
+class JSONModel(test_db.Model):
+    id = test_db.Column(test_db.Integer, primary_key=True)
+    data = test_db.Column(RESTResponseJSON(), nullable=True)
+
+
 class Model(ApiModel):
     def __init__(self, data=None):
         self._data = data
@@ -197,3 +205,20 @@ class OverridesModel(ApiModel):
     @_foo.setter
     def _foo(self, _foo):
         self._data._foo = self._set_string(_foo)
+
+
+class FieldsModel(ApiModel):
+    id = IntField()
+    id_doesnt_raise = IntField(raises_value_error=False)
+    string = StringField()
+    floating_point = FloatField()
+    flag = BoolField()
+    date_time = DateTimeField()
+    date = DateField()
+    func = Field()
+    ref = ModelField(Ref)
+    int_collection = CollectionField(IntField())
+    ref_collection = CollectionField(Ref)
+
+    def __init__(self, data=None):
+        self._data = data
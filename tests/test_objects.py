@@ -1,13 +1,23 @@
+import gc
+import io
 import json
+import math
+import pickle
+import textwrap
+import weakref
 from datetime import datetime, date
 from decimal import Decimal
 
 import pytest
 import RestResponse
 import requests
+import simplejson
+from sqlalchemy import event
 from sqlalchemy.exc import StatementError
 
-from tests.models import DBModel, Model, Ref, OverridesModel
+from RestResponse.orm.sqlalchemy import partial_update
+
+from tests.models import DBModel, JSONModel, Model, Ref, OverridesModel, FieldsModel
 
 
 def test_none_prop():
@@ -593,3 +603,1162 @@ def test_digit_keys():
     data = RestResponse.parse({})
     data[5] = 10
     assert data.get(5) == 10
+
+
+def test_lazy_loads(db, db_model, binary, user_text):
+    text = RestResponse.dumps({
+        'user': json.loads(user_text),
+        'records': [{'id': 1}, [binary], lambda x: x + 1]
+    })
+    obj = RestResponse.parse(json.loads(text), lazy=True)
+    assert isinstance(obj, RestResponse.LazyRestObject)
+    assert type(dict.__getitem__(obj, 'user')) is dict
+    assert type(dict.__getitem__(obj, 'records')) is list
+
+    obj = RestResponse.loads(text, lazy=True)
+    assert isinstance(obj, RestResponse.LazyRestObject)
+    assert type(dict.__getitem__(obj, 'records')) is list
+    # nested objects are not wrapped while decoding either
+    assert not isinstance(dict.__getitem__(obj, 'user'), RestResponse.RestObject)
+    assert not isinstance(list.__getitem__(dict.__getitem__(obj, 'records'), 0), RestResponse.RestObject)
+
+    assert isinstance(obj.user, RestResponse.RestObject)
+    assert isinstance(dict.__getitem__(obj, 'user'), RestResponse.LazyRestObject)
+    assert obj.user.address.geo.lat == '-37.3159'
+    assert isinstance(obj.user.address.missing, RestResponse.NoneProp)
+    assert obj.records[0].id == 1
+    assert obj.records[1][0] == binary
+    assert obj.records[2](1) == 2
+    assert [x for x in obj.records][0] == {'id': 1}
+    assert obj.pretty_print() == RestResponse.loads(text).pretty_print()
+
+    obj.user.missing.prop = 'set'
+    assert obj.user.missing.prop == 'set'
+
+    db_model.data = RestResponse.loads(text, lazy=True)
+    db.session.commit()
+    assert db_model.data.user.address.city == 'Gwenborough'
+    assert db_model.data.records[0].id == 1
+    assert db_model not in db.session.dirty
+
+    db_model.data.flag = True
+    assert db_model in db.session.dirty
+    db.session.commit()
+
+
+def test_rest_list_bulk(monkeypatch):
+    calls = []
+    monkeypatch.setattr(RestResponse.RestResponseObj, 'changed', lambda self: calls.append(self))
+
+    lst = RestResponse.RestList([{'id': 1}, [1, 2], RestResponse.parse({}).missing, 'item'])
+    assert len(lst) == 3
+    assert isinstance(lst[0], RestResponse.RestObject)
+    assert isinstance(lst[1], RestResponse.RestList)
+    assert lst not in calls
+
+    lst.extend([{'id': 2}, 'other'])
+    assert len(lst) == 5
+    assert isinstance(lst[3], RestResponse.RestObject)
+    assert calls.count(lst) == 1
+
+    lst.extend([])
+    assert calls.count(lst) == 1
+
+    refs = RestResponse.ApiCollection(Ref)
+    refs.extend([{'id': x} for x in range(3)])
+    assert [ref.id for ref in refs] == [0, 1, 2]
+    assert calls.count(refs) == 1
+
+    ints = RestResponse.ApiCollection(Model()._format_int, raises_value_error=False)
+    with pytest.warns(UserWarning):
+        ints.extend([1, 'test', '3'])
+    assert ints == [1, 3]
+
+
+def test_loads_decode(binary):
+    text = RestResponse.dumps({
+        'binary': binary,
+        'callable': lambda x: x + 1,
+        'dunder': '__not_encoded__',
+        'nested': [[binary, {'callable': lambda x: x + 2}], '__binary', 'text']
+    })
+    obj = RestResponse.loads(text)
+    assert isinstance(obj, RestResponse.RestObject)
+    assert obj.binary == binary
+    assert obj.callable(1) == 2
+    assert obj.dunder == '__not_encoded__'
+    assert isinstance(obj.nested, RestResponse.RestList)
+    assert isinstance(obj.nested[0], RestResponse.RestList)
+    assert obj.nested[0][0] == binary
+    assert isinstance(obj.nested[0][1], RestResponse.RestObject)
+    assert obj.nested[0][1].callable(1) == 3
+    assert obj.nested[1:] == ['__binary', 'text']
+    assert RestResponse.dumps(obj) == text
+    assert isinstance(obj.missing.prop, RestResponse.NoneProp)
+    obj.missing.prop = 'set'
+    assert obj.missing.prop == 'set'
+
+    lst = RestResponse.loads('[{"id": 1}, [1, 2], "text"]')
+    assert isinstance(lst, RestResponse.RestList)
+    assert isinstance(lst[0], RestResponse.RestObject)
+    assert isinstance(lst[1], RestResponse.RestList)
+
+    with pytest.raises(ValueError):
+        RestResponse.loads('{"invalid"')
+
+
+def test_json_backends(binary, user_text):
+    func = lambda x: x + 1  # noqa: E731
+    obj = RestResponse.parse({
+        'user': json.loads(user_text),
+        'binary': binary,
+        'callable': func,
+        'datetime': datetime(2020, 1, 2, 3, 4, 5),
+        'date': date(2020, 1, 2),
+        'decimal': Decimal('3.1459'),
+        'unicode': u'\U0001f44d',
+        'nan': float('nan'),
+        'tuple': (1, 2),
+        'lst': [[func, binary], {'id': 1}]
+    })
+    obj[5] = 10
+
+    expected = (RestResponse.dumps(obj), obj.pretty_print(), repr(obj), str(obj.lst), obj.lst.pretty_print())
+    try:
+        for backend in RestResponse.objects.JSON_BACKENDS:
+            RestResponse.RestResponse.set_json_backend(backend)
+            assert (
+                RestResponse.dumps(obj), obj.pretty_print(), repr(obj), str(obj.lst), obj.lst.pretty_print()
+            ) == expected
+
+        with pytest.raises(ValueError):
+            RestResponse.RestResponse.set_json_backend('missing')
+
+        RestResponse.RestResponse.register_json_backend('custom', lambda data, **kwargs: 'custom')
+        RestResponse.RestResponse.set_json_backend('custom')
+        assert RestResponse.dumps(obj) == obj.pretty_print() == repr(obj) == 'custom'
+    finally:
+        RestResponse.objects.JSON_BACKENDS.pop('custom', None)
+        RestResponse.RestResponse.set_json_backend('stdlib')
+
+
+def test_iter_loads(binary, user_text):
+    records = [json.loads(user_text)] * 3 + [{'binary': binary, 'callable': lambda x: x + 1, 'n': 1.5e10}]
+    text = RestResponse.dumps(records)
+
+    def chunked(data, size):
+        return (data[i:i + size] for i in range(0, len(data), size))
+
+    for source in (io.StringIO(text), io.BytesIO(text.encode('utf-8')), chunked(text.encode('utf-8'), 7)):
+        items = list(RestResponse.iter_loads(source, path='item', chunk_size=5))
+        assert len(items) == 4
+        assert all(isinstance(item, RestResponse.RestObject) for item in items)
+        assert items[0].address.geo.lat == '-37.3159'
+        assert items[-1].binary == binary
+        assert items[-1].callable(1) == 2
+        assert items[-1].n == 1.5e10
+
+    text = json.dumps({'meta': {'item': [1]}, 'data': {'items': [[1, 2], 'x', {'id': 1}]}, 'count': 3})
+    assert list(RestResponse.iter_loads(chunked(text, 3), path='data.items.item')) == [[1, 2], 'x', {'id': 1}]
+    assert list(RestResponse.iter_loads(chunked(text, 3), path='count')) == [3]
+    assert list(RestResponse.iter_loads(chunked(text, 3), path='missing.item')) == []
+    assert list(RestResponse.iter_loads(io.StringIO('{"items": [{"id": 1}, 2], "total": 2}'))) == [{'id': 1}, 2]
+    assert list(RestResponse.iter_loads(io.StringIO('[]'), path='item')) == []
+    assert list(RestResponse.iter_loads(io.BytesIO(u'["\U0001f44d"]'.encode('utf-8')), 'item', chunk_size=1)) == [
+        u'\U0001f44d'
+    ]
+
+    # values off the path are skipped without decoding them, callables included
+    text = '{"meta": {"f": "__callable__: @unregistered", "s": ["a]\\"}\\\\", {"b": "{"}]}, "n": -1.5, ' \
+        '"data": {"items": [{"id": 1}], "other": "}"}}'
+    assert json.loads(text)['meta']['s'][0] == 'a]"}\\'
+    for size in (1, 2, 3, 1024):
+        assert list(RestResponse.iter_loads(chunked(text, size), path='data.items.item')) == [{'id': 1}]
+    with pytest.raises(ValueError):
+        list(RestResponse.iter_loads(io.StringIO(text), path='meta.f'))
+
+    # values ending exactly at a chunk boundary are decoded once, numbers are read until they end
+    calls = []
+
+    def hook(pairs):
+        calls.append(pairs)
+        return dict(pairs)
+    reader = RestResponse.utils.JSONStreamReader(
+        ['[{"a": {"b": 1}}', ', "x"', ', 12', '34', ', true]'], decoder=json.JSONDecoder(object_pairs_hook=hook)
+    )
+    assert list(reader.iter_path('item')) == [{'a': {'b': 1}}, 'x', 1234, True]
+    assert len(calls) == 2
+
+    for invalid in ('[{"id": 1}, {"id"', '[1, 2] 3', '[1 2]', ''):
+        with pytest.raises(ValueError):
+            list(RestResponse.iter_loads(io.StringIO(invalid), path='item'))
+    for invalid in ('{"a": [1, {"b": 1}', '{"a": "1}', '{"a": [1] "b": 1}'):
+        with pytest.raises(ValueError):
+            list(RestResponse.iter_loads(io.StringIO(invalid), path='b'))
+
+
+def test_iterdumps(tmp_path, binary, user_text):
+    obj = RestResponse.parse({
+        'user': json.loads(user_text),
+        'binary': binary,
+        'callable': lambda x: x + 1,
+        'datetime': datetime(2020, 1, 2, 3, 4, 5),
+        'decimal': Decimal('3.1459'),
+        'unicode': u'\U0001f44d',
+        'floats': [1.5, float('inf'), float('nan')],
+        'empty': [{}, []],
+        'tuple': (1, None, True, False),
+        'model': Ref({'id': 5}),
+    })
+    obj[5] = 10
+    raw = json.loads(RestResponse.dumps(obj))
+
+    for kwargs in ({}, {'indent': 4}, {'indent': '\t'}, {'separators': (',', ':')},
+                   {'ensure_ascii': False}):
+        expected = RestResponse.dumps(obj, **kwargs)
+        chunks = list(RestResponse.iterdumps(obj, chunk_size=100, **kwargs))
+        assert len(chunks) > 1
+        assert ''.join(chunks) == expected
+        assert json.loads(''.join(chunks))['callable'] == raw['callable']
+
+    assert ''.join(RestResponse.iterdumps(obj.user, sort_keys=True)) == RestResponse.dumps(obj.user, sort_keys=True)
+
+    RestResponse.dump(obj, io.StringIO())
+    with open(str(tmp_path / 'dump.json'), 'wb') as fp:
+        RestResponse.dump(obj, fp, chunk_size=10)
+    with open(str(tmp_path / 'dump.json'), 'r') as fp:
+        assert RestResponse.loads(fp.read()).binary == binary
+
+    with pytest.raises(ValueError):
+        list(RestResponse.iterdumps([float('nan')], allow_nan=False))
+    # same errors as dumps
+    for data in ({'set': {1}}, {'object': object()}):
+        with pytest.raises(ValueError):
+            RestResponse.dumps(data)
+        with pytest.raises(ValueError):
+            list(RestResponse.iterdumps(data))
+        with pytest.raises(ValueError):
+            RestResponse.dump(data, io.StringIO())
+
+    assert simplejson.dumps({'binary': binary}) == RestResponse.dumps({'binary': binary})
+
+
+def test_to_primitive(binary, user_text):
+    obj = RestResponse.parse({
+        'user': json.loads(user_text),
+        'binary': binary,
+        'callable': lambda x: x + 1,
+        'datetime': datetime(2020, 1, 2, 3, 4, 5),
+        'decimal': Decimal('3.1459'),
+        'tuple': (1, None, True, 1.5),
+        'model': Ref({'id': 5}),
+        'models': RestResponse.ApiCollection(Ref, [{'id': 1}]),
+    })
+    obj[5] = 10
+
+    primitive = obj.to_primitive()
+    assert primitive == json.loads(RestResponse.dumps(obj))
+    assert type(primitive) is dict
+    assert type(primitive['user']['address']) is dict
+    assert type(primitive['models']) is list
+    assert primitive['5'] == 10
+    primitive['user']['name'] = 'changed'
+    assert obj.user.name == 'Leanne Graham'
+
+    assert RestResponse.parse([binary, {'id': 1}]).to_primitive() == json.loads(
+        RestResponse.dumps([binary, {'id': 1}])
+    )
+    with pytest.raises(ValueError):
+        obj.to_primitive({'encode_binary': False})
+    with pytest.raises(ValueError):
+        RestResponse.parse({'callable': lambda x: x}).to_primitive({'encode_callable': False})
+
+
+def test_api_model_fields():
+    class Fields(Ref):
+        @property
+        def read_only(self):
+            return self._data.read_only
+
+        def method(self):
+            return 'method'
+
+    model = Fields({'id': 1, 'string': 'foo', 'read_only': 'bar', 'method': 'baz', 'missing': 1})
+    assert model._data == {'id': 1, 'string': 'foo'}
+    assert model.method() == 'method'
+    with pytest.raises(AttributeError):
+        model._data.keys = 'protected'
+
+    fields = RestResponse.objects._api_model_fields(Fields, ())
+    assert fields == ('id', 'string')
+    assert RestResponse.objects._api_model_fields(Fields, ()) is fields
+
+    # plain attributes are set from data, through the model's own __setattr__
+    assigned = []
+
+    class Plain(Ref):
+        kind = 'default'
+
+        def __init__(self, data=None):
+            self.label = None
+            super(Plain, self).__init__(data)
+
+        def __setattr__(self, name, value):
+            assigned.append(name)
+            super(Plain, self).__setattr__(name, value)
+
+    model = Plain({'id': 1, 'kind': 'custom', 'label': 'x'})
+    assert model.kind == 'custom' and Plain.kind == 'default' and model.label == 'x' and model.id == 1
+    assert {'id', 'kind', 'label'} <= set(assigned)
+
+    # the cache does not keep classes alive
+    class Dynamic(Ref):
+        pass
+    Dynamic({'id': 1})
+    dynamic = weakref.ref(Dynamic)
+    del Dynamic
+    gc.collect()
+    assert dynamic() is None
+
+    class Underscored(Ref):
+        @property
+        def _bar(self):
+            return self._data._bar
+
+        @_bar.setter
+        def _bar(self, _bar):
+            self._data._bar = _bar
+
+    assert '_bar' not in Underscored({'_bar': 'foo'})._data
+    Underscored.__opts__ = dict(Underscored.__opts__, _overrides=['_bar'])
+    assert Underscored({'_bar': 'foo'})._bar == 'foo'
+
+
+def test_fields():
+    d = datetime(2020, 1, 2, 3, 4, 5)
+    model = FieldsModel({
+        'id': '5',
+        'string': 'foo',
+        'floating_point': 4,
+        'flag': True,
+        'date_time': d.isoformat(),
+        'date': '2020-01-02',
+        'func': lambda x: x + 1,
+        'ref': {'id': 1, 'foo': 'bar'},
+        'int_collection': [1, '2'],
+        'ref_collection': [{'id': 1}, {'id': 2}],
+        'foo': 'bar'
+    })
+    assert 'foo' not in model._data
+    assert model.id == 5
+    assert model.string == 'foo'
+    assert model.floating_point == 4.0
+    assert model.flag is True
+    assert model.date_time == d
+    assert model.date == date(2020, 1, 2)
+    assert model.func(1) == 2
+    assert isinstance(model.ref, Ref)
+    assert model.ref.id == 1
+    assert 'foo' not in model.ref._data
+    assert model.int_collection == [1, 2]
+    assert [ref.id for ref in model.ref_collection] == [1, 2]
+    assert model._as_json['date_time'] == '2020-01-02T03:04:05Z'
+
+    assert model.date_time is model.date_time
+    model._data.date_time = '2021-01-01T00:00:00Z'
+    assert model.date_time == datetime(2021, 1, 1)
+    model.date_time = d
+    assert model.date_time == d
+
+    with pytest.raises(ValueError):
+        model.id = 'test'
+    with pytest.raises(ValueError):
+        model.string = 5
+    with pytest.raises(ValueError):
+        model.int_collection.append('test')
+    with pytest.warns(UserWarning):
+        model.id_doesnt_raise = 'test'
+    assert model.id_doesnt_raise is None
+
+    empty = FieldsModel()
+    assert not empty.ref
+    assert len(empty.int_collection) == 0
+    empty.int_collection.append(1)
+    assert empty._data.int_collection == [1]
+    assert FieldsModel.id.name == 'id'
+
+
+def test_parse_datetime():
+    from dateutil import parser as dateutil_parser
+
+    format = '%Y-%m-%dT%H:%M:%SZ'
+    for value in (
+        '2020-01-02T03:04:05Z', '2020-01-02T03:04:05.123456', '2020-01-02 03:04:05+02:00', 'Jan 2 2020 3:04PM',
+        '2020-01-02', b'2020-01-02T03:04:05'
+    ):
+        expected = datetime.strptime(dateutil_parser.parse(value).strftime(format), format)
+        assert RestResponse.utils.parse_datetime(value, format=format) == expected
+        assert RestResponse.utils.parse_date(value) == expected.date()
+
+    assert RestResponse.utils.parse_datetime('2020-01-02T03:04:05Z') is RestResponse.utils.parse_datetime(
+        '2020-01-02T03:04:05Z'
+    )
+    with pytest.raises(ValueError):
+        RestResponse.utils.parse_datetime('test')
+    # other formats only normalize, values are still read the way dateutil reads them
+    assert RestResponse.utils.parse_datetime('03/04/2020', format='%d/%m/%Y') == datetime(2020, 3, 4)
+    assert RestResponse.utils.parse_datetime('03/04/2020', format='%m/%d/%Y') == datetime(2020, 3, 4)
+
+    model = Model()
+    d = datetime(2020, 1, 2, 3, 4, 5, 6)
+    assert model._set_datetime(d) is d
+    assert model._set_datetime(d.date()) == datetime(2020, 1, 2)
+    assert model._set_date(d) == date(2020, 1, 2)
+    assert model._set_datetime('2020-01-02T03:04:05.000006') == d.replace(microsecond=0)
+    with pytest.raises(ValueError):
+        model._set_date('test')
+    with pytest.warns(UserWarning):
+        assert model._get_datetime('test') is None
+
+
+def test_istext(binary, monkeypatch):
+    istext = RestResponse.utils.istext
+    assert istext(b'') and istext('')
+    assert istext(b'byte string') and istext('text\n\t')
+    assert istext(u'caf\xe9 au lait'.encode('utf-8'))
+    assert not istext(u'\U0001f44d'.encode('utf-8'))
+    assert not istext(b'text\0')
+    assert not istext(b'\x01\x02\x03text')
+    assert not istext(binary)
+    assert istext(b'\x01\x02\x03text', text_characters='\x01\x02\x03text')
+
+    istext_many = RestResponse.utils.istext_many
+    assert istext_many([b'text', binary, 'text', bytearray(b'\x00'), b'']) == [True, False, True, False, True]
+    assert istext_many([b'\x01\x02\x03text'], text_characters='\x01\x02\x03text') == [True]
+    assert istext_many([b'text \x01'], threshold=0.1) == [False]
+    assert istext_many([]) == []
+
+    calls = []
+    monkeypatch.setattr(RestResponse.utils, 'istext', lambda s: calls.append(s) or istext(s))
+    assert RestResponse.utils.encode_item(binary).startswith('__binary__: ')
+    assert RestResponse.utils.encode_item(binary, encode_binary=False) == binary
+    assert RestResponse.utils.encode_item(b'text') == 'text'
+    assert len(calls) == 3
+
+
+def test_buffer_binary(binary):
+    utils = RestResponse.utils
+    encoded = utils.encode_item(binary)
+    assert utils.encode_item(bytearray(binary)) == encoded
+    assert utils.encode_item(memoryview(binary)) == encoded
+    assert utils.encode_item(memoryview(bytearray(b'text'))) == 'text'
+    assert utils.decode_item(encoded) == binary
+    assert utils.decode_item(encoded.encode('utf-8')) == binary
+
+    large = binary * (utils.BINARY_CHUNK_SIZE // len(binary) + 2)
+    assert len(large) > utils.BINARY_CHUNK_SIZE
+    assert not utils.istext(large) and not utils.istext(memoryview(large))
+    text = u'caf\xe9 au lait '.encode('utf-8') * (utils.BINARY_CHUNK_SIZE // 8)
+    assert utils.istext(text) and utils.istext(bytearray(text))
+    assert ''.join(utils.iter_encode_binary(large, chunk_size=1000)) == utils.encode_item(large)
+
+    obj = RestResponse.parse({'blob': memoryview(large), 'buffer': bytearray(b'text')})
+    assert ''.join(RestResponse.iterdumps(obj, chunk_size=1024)) == RestResponse.dumps(obj)
+    loaded = RestResponse.loads(RestResponse.dumps(obj))
+    assert loaded.blob == large
+    assert loaded.buffer == 'text'
+
+
+def test_callable_codec():
+    utils = RestResponse.utils
+    utils.callable_cache_clear()
+
+    # module-level functions pickle by reference and are cached both ways
+    module_level = RestResponse.dumps({'callable': textwrap.dedent})
+    assert RestResponse.dumps({'callable': textwrap.dedent}) == module_level
+    assert utils.callable_cache_info()['encode'].hits == 1
+    assert RestResponse.loads(module_level).callable is RestResponse.loads(module_level).callable is textwrap.dedent
+    assert utils.callable_cache_info()['decode'].hits == 1
+
+    # other callables carry state, they are pickled and unpickled every time
+    def increment(x, step=1):
+        return x + step
+
+    obj = RestResponse.parse({'callable': increment})
+    text = RestResponse.dumps(obj)
+    increment.__defaults__ = (2,)
+    assert RestResponse.loads(RestResponse.dumps(obj)).callable(1) == 3
+    increment.__defaults__ = (1,)
+    assert RestResponse.dumps(obj) == text
+    first, second = RestResponse.loads(text).callable, RestResponse.loads(text).callable
+    assert first is not second and first(1) == second(1) == 2
+    info = utils.callable_cache_info()
+    assert info['encode'].hits == 1 and info['encode'].currsize == 1
+    assert info['decode'].hits == 1 and info['decode'].currsize == 1
+
+    RestResponse.register_callable(increment, name='increment')
+    try:
+        assert RestResponse.dumps(obj) == '{"callable": "__callable__: @increment"}'
+        assert RestResponse.loads(RestResponse.dumps(obj)).callable is increment
+        with pytest.raises(ValueError):
+            RestResponse.loads('{"callable": "__callable__: @unknown"}')
+
+        RestResponse.set_callable_registry_only()
+        assert RestResponse.loads(RestResponse.dumps(obj)).callable(1) == 2
+        with pytest.raises(ValueError):
+            RestResponse.dumps({'callable': lambda x: x})
+        with pytest.raises(ValueError):
+            RestResponse.loads(text)
+    finally:
+        RestResponse.set_callable_registry_only(False)
+        utils.unregister_callable('increment')
+    assert RestResponse.dumps(obj) == text
+
+
+def test_repr_policy(binary, monkeypatch):
+    obj = RestResponse.parse({
+        'nested': {'a': {'b': {'c': 1}}},
+        'items': list(range(10)),
+        'string': 'x' * 20,
+        'binary': binary,
+    })
+    assert repr(obj) == str(obj) == RestResponse.dumps(obj)
+    # objects no limit applies to are encoded by the JSON backend, not walked
+    walked = []
+    monkeypatch.setattr(RestResponse.objects, '_iterencode', lambda *args, **kwargs: walked.append(args) or iter(()))
+    assert repr(obj) == RestResponse.dumps(obj) and not walked
+    monkeypatch.undo()
+    try:
+        RestResponse.RestResponse.set_repr_policy(max_depth=3, max_items=5, max_string=16, max_length=None)
+        truncated = json.loads(repr(obj))
+        assert truncated['nested'] == {'a': {'b': '{...}'}}
+        assert truncated['items'] == [0, 1, 2, 3, 4, '... (+5 items)']
+        assert truncated['string'] == 'x' * 16 + '... (+4 characters)'
+        assert truncated['binary'].startswith('__binary__: ')
+        assert truncated['binary'].endswith('... (+%d bytes)' % (len(binary) - 12))
+        assert json.loads(str(obj['items'])) == truncated['items']
+        assert obj.pretty_print() == RestResponse.dumps(obj, indent=4)
+
+        RestResponse.RestResponse.set_repr_policy(max_items=1)
+        assert json.loads(repr(obj.nested)) == {'a': {'b': {'c': 1}}}
+        assert json.loads(repr(obj['items'])) == [0, '... (+9 items)']
+        assert json.loads(repr(obj)) == {'nested': {'a': {'b': '{...}'}}, '...': '+3 items'}
+
+        RestResponse.RestResponse.set_repr_policy(max_depth=None, max_items=None, max_string=None, max_length=20)
+        assert repr(obj) == RestResponse.dumps(obj)[:20] + '...'
+        # escaping makes the output longer than estimated, it is still cut
+        escaped = RestResponse.parse({'s': '\x01' * 10})
+        assert repr(escaped) == RestResponse.dumps(escaped)[:20] + '...'
+
+        with pytest.raises(ValueError):
+            RestResponse.RestResponse.set_repr_policy(max_size=1)
+    finally:
+        RestResponse.RestResponse.set_repr_policy(**RestResponse.objects.DEFAULT_REPR_POLICY)
+    assert repr(obj) == RestResponse.dumps(obj)
+
+
+def test_snapshot(user_text):
+    base = RestResponse.parse({'tenant': {'name': 'base', 'tags': ['a', 'b']}, 'user': json.loads(user_text)})
+    text = RestResponse.dumps(base)
+    user = base['user']
+
+    overlay = base.evolve('tenant.tags.1', 'c')
+    assert overlay.tenant.tags == ['a', 'c']
+    assert base.tenant.tags == ['a', 'b']
+    assert RestResponse.dumps(base) == text
+    # untouched subtrees are shared, modified paths are copies
+    assert dict.__getitem__(overlay, 'user') is user
+    assert dict.__getitem__(overlay, 'tenant') is not dict.__getitem__(base, 'tenant')
+
+    snapshot = overlay.snapshot()
+    snapshot.user.address.city = 'Elsewhere'
+    snapshot.tenant.name = 'snapshot'
+    assert overlay.user.address.city == base.user.address.city == json.loads(user_text)['address']['city']
+    assert overlay.tenant.name == 'base'
+    overlay.tenant.tags.append('d')
+    assert snapshot.tenant.tags == ['a', 'c']
+    assert base.evolve(('tenant', 'new', 'key'), 1).tenant.new.key == 1
+    assert not base.tenant.new
+
+    lst = RestResponse.parse([{'id': 1}, {'id': 2}])
+    copy = lst.evolve('0.id', 10)
+    assert [x.id for x in copy] == [10, 2]
+    assert [x.id for x in lst] == [1, 2]
+    assert isinstance(lst, RestResponse.RestList) and isinstance(copy, RestResponse.RestList)
+
+
+def test_snapshot_sharing(user_text):
+    src = RestResponse.parse({'user': json.loads(user_text), 'items': [{'id': 1, 'tags': ['a']}, {'id': 2}]})
+    text = RestResponse.dumps(src)
+    snap = src.snapshot()
+    assert type(src) is RestResponse.RestObject and isinstance(snap, RestResponse.SharedRestObject)
+
+    def shared():
+        return dict.__getitem__(snap, 'user') is dict.__getitem__(src, 'user') and \
+            dict.__getitem__(snap, 'items') is dict.__getitem__(src, 'items')
+
+    # reads never copy
+    assert RestResponse.dumps(snap) == text and snap.pretty_print() == src.pretty_print() and repr(snap)
+    assert snap.user.address.geo.lat == src.user.address.geo.lat and snap == src
+    assert [item.id for item in snap['items']] == [1, 2] and snap.to_primitive() == json.loads(text)
+    assert len(list(snap.values())) == 2 and snap.get_path('items.0.tags.0') == 'a'
+    assert shared() and RestResponse.dumps(src) == text
+    user = snap.user
+    assert snap.user is user
+
+    # writes copy the written path only
+    user.address.city = 'Elsewhere'
+    snap_user = dict.__getitem__(snap, 'user')
+    assert snap_user is user and src.user.address.city == json.loads(user_text)['address']['city']
+    assert dict.__getitem__(snap_user, 'company') is dict.__getitem__(src.user, 'company')
+    assert dict.__getitem__(snap, 'items') is dict.__getitem__(src, 'items')
+    snap['items'][0].tags.append('b')
+    assert snap['items'][0].tags == ['a', 'b'] and src['items'][0].tags == ['a']
+    assert list.__getitem__(snap['items'], 1) is list.__getitem__(src['items'], 1)
+    assert snap.diff() == [
+        ('replace', ('user', 'address', 'city'), 'Elsewhere'), ('replace', ('items', 0, 'tags'), ['a', 'b'])
+    ]
+    snap.mark_clean()
+    assert snap.diff() == [] and src.diff() == []
+
+    # objects removed from a snapshot are copies, the source's own writes stay plain
+    item = snap['items'].pop(1)
+    item.id = 3
+    assert src['items'][1].id == 2 and len(src['items']) == 2
+    src.update({'new': {'id': 1}})
+    assert type(src.new) is RestResponse.RestObject and 'new' not in snap
+
+    lazy = RestResponse.loads(text, lazy=True).snapshot()
+    lazy.user.address.city = 'Lazy'
+    assert lazy.user.address.city == 'Lazy' and lazy.user.name == src.user.name
+
+
+def test_snapshot_isolation(user_text):
+    src = RestResponse.parse({'user': json.loads(user_text), 'items': [{'id': 1, 'tags': ['a']}, {'id': 2}]})
+    address, tags = src.user.address, src['items'][0].tags
+    text = RestResponse.dumps(src)
+    primitive = json.loads(text)
+    snap = src.snapshot()
+
+    # writes to the source, including through objects obtained before the snapshot, do not reach it
+    src.user.address.city = 'Elsewhere'
+    address.zipcode = None
+    tags.append('b')
+    tags.sort(reverse=True)
+    src['items'][1].setdefault('name', 'new')
+    src['items'][1] |= {'id': 3}
+    src['items'].reverse()
+    src.user.company.clear()
+    assert RestResponse.dumps(snap) == text and snap.to_primitive() == primitive
+    assert ''.join(RestResponse.iterdumps(snap, chunk_size=16)) == text and repr(snap) == text
+    assert snap.user.address.city == primitive['user']['address']['city'] and snap['items'][0].tags == ['a']
+    assert [item.id for item in snap['items']] == [1, 2] and 'name' not in snap['items'][1]
+    assert src['items'][1].tags == ['b', 'a'] and src.user.address.zipcode is None
+
+    # copies of the snapshot hold its handles, not the shared objects
+    for copy in (dict(snap), {**snap}, snap.copy(), snap | {}):
+        copy['user'].address.city = 'Copy'
+        copy['items'].append({'id': 4})
+    assert src.user.address.city == 'Elsewhere' and len(src['items']) == 2
+    assert snap.user.address.city == 'Copy' and [item.id for item in snap['items']] == [1, 2, 4, 4, 4, 4]
+    del snap['items'][3:]
+    snap_items = snap['items']
+    snap_items.sort(key=lambda item: -item.id)
+    assert [item.id for item in snap_items] == [4, 2, 1] and [item.id for item in src['items']] == [3, 1]
+    assert [item.id for item in reversed(snap_items)] == [1, 2, 4]
+    (snap_items + [])[0].id = 5
+    assert snap_items[0].id == 5 and src['items'][0].id == 3
+
+    # snapshots of snapshots, and sources writing after both
+    first = src.snapshot()
+    second = first.snapshot()
+    first.user.name = 'First'
+    src.user.name = 'Source'
+    assert second.user.name == primitive['user']['name'] and first.user.name == 'First'
+    assert second['items'].pop(1).id == 1 and [item.id for item in src['items']] == [3, 1]
+
+    # nothing is saved for snapshots no longer in use
+    del snap, snap_items, copy, first, second
+    gc.collect()
+    assert not RestResponse.objects._live_snapshots
+    src.user.address.city = 'Again'
+    assert address.__dict__['__epoch__'] == RestResponse.objects._snapshot_epoch
+
+
+def test_snapshot_changed(db, db_model):
+    model = db_model
+    model.data = {'tenant': {'name': 'base'}}
+    db.session.commit()
+
+    copy = model.data.evolve('tenant.name', 'copy')
+    assert not db.session.dirty
+    model.data.name = 'changed'
+    assert model in db.session.dirty
+    db.session.commit()
+    assert model.data.tenant.name == 'base'
+    assert copy.tenant.name == 'copy'
+
+
+def test_diff(user_text):
+    obj = RestResponse.loads(json.dumps({'user': json.loads(user_text), 'tags': ['a'], 'a/b': 1}))
+    assert obj.diff() == [] and RestResponse.parse({'id': 1}).diff() == []
+    assert RestResponse.RestList([1]).diff() == []
+
+    obj.user.name = 'Changed'
+    obj.user.address.zipcode = None
+    obj.user.new = {'id': 1}
+    obj.tags.append('b')
+    obj.pop('a/b')
+    del obj.user['email']
+    obj.missing.key = 1
+    obj.user.new.id = 2
+    assert obj.diff() == [
+        ('remove', ('a/b',), None),
+        ('add', ('missing',), {'key': 1}),
+        ('replace', ('user', 'name'), 'Changed'),
+        ('add', ('user', 'new'), {'id': 2}),
+        ('remove', ('user', 'email'), None),
+        ('replace', ('user', 'address', 'zipcode'), None),
+        ('replace', ('tags',), ['a', 'b']),
+    ]
+    assert obj.as_json_patch() == [
+        {'op': 'remove', 'path': '/a~1b'},
+        {'op': 'add', 'path': '/missing', 'value': {'key': 1}},
+        {'op': 'replace', 'path': '/user/name', 'value': 'Changed'},
+        {'op': 'add', 'path': '/user/new', 'value': {'id': 2}},
+        {'op': 'remove', 'path': '/user/email'},
+        {'op': 'replace', 'path': '/user/address/zipcode', 'value': None},
+        {'op': 'replace', 'path': '/tags', 'value': ['a', 'b']},
+    ]
+
+    obj.mark_clean()
+    assert obj.diff() == []
+    obj.tags[0] = 'c'
+    obj.added = 1
+    del obj.added
+    assert obj.diff() == [('replace', ('tags',), ['c', 'b'])]
+    assert obj.evolve('user.name', 'Evolved').diff() == [
+        ('replace', ('user', 'name'), 'Evolved'), ('replace', ('tags',), ['c', 'b'])
+    ]
+    obj.tags.mark_clean()
+    assert obj.tags.as_json_patch() == []
+    obj.tags.remove('c')
+    assert obj.tags.as_json_patch() == [{'op': 'replace', 'path': '', 'value': ['b']}]
+
+
+def test_orm_sqlalchemy_json(db, binary, user_text):
+    model = JSONModel()
+    model.data = {'user': json.loads(user_text), 'binary': binary, 'tags': ['a'], 'gone': 1}
+    db.session.add(model)
+    db.session.commit()
+
+    session = db._make_scoped_session(dict(expire_on_commit=False))
+    committed = session.get(JSONModel, model.id)
+    assert committed.data.binary == binary
+    assert committed.data.user.address.city == json.loads(user_text)['address']['city']
+    session.close()
+
+    model.data.user.address.city = 'Elsewhere'
+    model.data.user.extra = {'id': 1}
+    model.data.tags.append(1.5)
+    del model.data['gone']
+    model.data.flag = True
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert partial_update(db.session, model, 'data')
+        assert not model.data.diff()
+        db.session.commit()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert len(statements) == 1 and 'json_set' in statements[0]
+
+    expected = json.loads(user_text)
+    expected['address']['city'] = 'Elsewhere'
+    expected['extra'] = {'id': 1}
+    session = db._make_scoped_session(dict(expire_on_commit=False))
+    committed = session.get(JSONModel, model.id)
+    assert committed.data.user == expected
+    assert committed.data.tags == ['a', 1.5]
+    assert committed.data.flag is True
+    assert 'gone' not in committed.data
+    assert committed.data.binary == binary
+    session.close()
+
+    model.data = [1, 2]
+    db.session.commit()
+    model.data.append(3)
+    assert partial_update(db.session, model, 'data')
+    db.session.commit()
+    session = db._make_scoped_session(dict(expire_on_commit=False))
+    assert session.get(JSONModel, model.id).data == [1, 2, 3]
+    session.close()
+
+    # SQLite paths cannot address keys with a double quote, the whole value is written instead
+    model.data = {'a': {'b': 1}}
+    db.session.commit()
+    model.data['q"k'] = 1
+    model.data.a['x"y'] = 2
+    model.data.a.b = 3
+    assert partial_update(db.session, model, 'data')
+    assert not model.data.diff()
+    db.session.commit()
+    session = db._make_scoped_session(dict(expire_on_commit=False))
+    assert session.get(JSONModel, model.id).data == {'q"k': 1, 'a': {'b': 3, 'x"y': 2}}
+    session.close()
+
+    # the JSON functions reject NaN and Infinity, the whole value is written instead
+    model.data.a.b = float('nan')
+    model.data.a.c = float('inf')
+    assert partial_update(db.session, model, 'data')
+    assert not model.data.diff()
+    db.session.commit()
+    session = db._make_scoped_session(dict(expire_on_commit=False))
+    committed = session.get(JSONModel, model.id)
+    assert math.isnan(committed.data.a.b) and committed.data.a.c == float('inf')
+    session.close()
+
+    # nothing to write for an attribute without a RestObject or RestList
+    model.data = None
+    db.session.commit()
+    assert partial_update(db.session, model, 'data') is False
+
+
+def test_deferred_rest_object(db, db_model, user_text):
+    db_model.data = {'user': json.loads(user_text), 'records': [1, 2]}
+    db.session.commit()
+    column_type = DBModel.__table__.c.data.type
+    raw = column_type.process_bind_param(db_model.data, None)
+
+    session = db._make_scoped_session(dict(expire_on_commit=False))
+    committed = session.get(DBModel, db_model.id)
+    data = committed.data
+    assert type(data) is RestResponse.DeferredRestObject
+    assert data.__dict__['_raw'] == raw
+    assert column_type.process_bind_param(data, None) is data.__dict__['_raw']
+    assert type(data) is RestResponse.DeferredRestObject
+
+    assert len(data) == 2
+    assert type(data) is RestResponse.RestObject
+    assert data.user.name == json.loads(user_text)['name']
+    assert column_type.process_bind_param(data, None) == raw
+
+    deferred = RestResponse.DeferredRestObject(raw)
+    assert RestResponse.dumps(deferred) == raw.decode('utf-8')
+    assert 'records' in RestResponse.DeferredRestObject(raw)
+    assert RestResponse.DeferredRestObject(raw, lazy=True).user.address.city
+    assert RestResponse.DeferredRestObject(raw).pretty_print() == RestResponse.dumps(deferred, indent=4)
+    assert isinstance(column_type.process_result_value(b'[1]', None), RestResponse.RestList)
+
+    # undecoded values nested in other values or passed to plain encoders are decoded, not written as {}
+    expected = json.loads(raw)
+    assert json.loads(RestResponse.dumps({'x': RestResponse.DeferredRestObject(raw)})) == {'x': expected}
+    assert json.loads(RestResponse.dumps([RestResponse.DeferredRestObject(raw)])) == [expected]
+    assert json.dumps(RestResponse.DeferredRestObject(raw), sort_keys=True) == json.dumps(expected, sort_keys=True)
+    assert json.JSONEncoder().encode(RestResponse.DeferredRestObject(raw)) == json.dumps(expected)
+    assert json.dumps(object(), default=lambda o: RestResponse.DeferredRestObject(raw)) == json.dumps(expected)
+
+    data.flag = True
+    assert committed in session.dirty
+    session.commit()
+    session.close()
+    db.session.refresh(db_model)
+    assert db_model.data.flag is True
+    db.session.commit()
+
+    session = db._make_scoped_session(dict(expire_on_commit=False))
+    loaded = session.get(DBModel, db_model.id).data
+    assert type(loaded) is RestResponse.DeferredRestObject
+    other = DBModel()
+    other.data = {'copied': loaded}
+    session.add(other)
+    session.commit()
+    session.close()
+    assert db.session.get(DBModel, other.id).data.copied.flag is True
+
+
+def test_orm_sqlalchemy_compression(user_text):
+    from RestResponse.orm import sqlalchemy as orm
+
+    data = RestResponse.parse({'users': [json.loads(user_text)] * 20})
+    plain = orm.RestResponseEncodedObj().process_bind_param(data, None)
+    for compression in ('zlib', 'lzma', 'zstd-if-available'):
+        column_type = orm.RestResponseEncodedObj(compression=compression, level=1)
+        stored = column_type.process_bind_param(data, None)
+        assert stored.startswith(orm.COMPRESSION_MAGIC)
+        assert len(stored) < len(plain) / 4
+        # untouched values are written back as stored
+        assert column_type.process_bind_param(column_type.process_result_value(stored, None), None) is stored
+        loaded = column_type.process_result_value(stored, None)
+        assert loaded == data
+        assert orm.decompress(column_type.process_bind_param(loaded, None)) == plain
+        # uncompressed rows stay readable
+        assert column_type.process_result_value(plain, None) == data
+
+    column_type = orm.RestResponseEncodedObj(compression='zlib', threshold=len(plain) + 1)
+    assert column_type.process_bind_param(data, None) == plain
+    with pytest.raises(ValueError):
+        orm.RestResponseEncodedObj(compression='missing')
+    with pytest.raises(ValueError):
+        orm.decompress(orm.COMPRESSION_MAGIC + b'?')
+
+
+def test_packb(binary, user_text):
+    from RestResponse import pack
+
+    func = lambda x: x + 1  # noqa: E731
+    obj = RestResponse.parse({
+        'user': json.loads(user_text),
+        'binary': binary,
+        'text_bytes': b'text',
+        'callable': func,
+        'datetime': datetime(2020, 1, 2, 3, 4, 5, 6),
+        'date': date(2020, 1, 2),
+        'decimal': Decimal('3.1459'),
+        'unicode': u'\U0001f44d' * 20,
+        'ints': [0, -1, -33, 255, -129, 65536, -65536, 2 ** 40, -2 ** 40, 2 ** 64, -2 ** 70],
+        'floats': [1.5, float('inf')],
+        'lst': [[binary], {'id': 1}, [], {}, None, True, False],
+        1: 'int key',
+        'long': ['x' * 70000] * 20,
+    })
+    packed = pack._packb_python(obj)
+    assert len(packed) < len(RestResponse.dumps(obj))
+    for unpacked in (pack._unpackb_python(packed), RestResponse.unpackb(RestResponse.packb(obj))):
+        assert isinstance(unpacked, RestResponse.RestObject) and isinstance(unpacked.lst, RestResponse.RestList)
+        assert unpacked.diff() == []
+        assert unpacked.callable(1) == 2
+        assert unpacked.keys() == obj.keys()
+        assert all(unpacked[k] == obj[k] for k in obj if k != 'callable')
+        assert isinstance(unpacked.decimal, Decimal) and unpacked.binary == binary and unpacked.text_bytes == b'text'
+
+    assert isinstance(pack._unpackb_python(pack._packb_python([1, {'a': 2}])), RestResponse.RestList)
+    with pytest.raises(ValueError):
+        RestResponse.unpackb(packed[:-1])
+    with pytest.raises(ValueError):
+        RestResponse.unpackb(packed + b'\x00')
+    # lengths running past the end, and keys that can not be dict keys
+    for data in (b'\xa5abc', b'\xc4\x05ab', b'\xd9\x05abc', b'\xc7\x05\x01ab', b'\xd6\x01ab'):
+        with pytest.raises(ValueError, match='truncated'):
+            pack._unpackb_python(data)
+    with pytest.raises(ValueError, match='hashable'):
+        pack._unpackb_python(b'\x81\x91\x01\x02')
+    with pytest.raises(ValueError):
+        RestResponse.unpackb(b'\x81\x91\x01\x02')
+    with pytest.raises(TypeError):
+        RestResponse.packb({'object': object()})
+
+    msgpack = pytest.importorskip('msgpack')
+    assert pack._packb_msgpack(obj) == packed
+    assert msgpack.unpackb(packed, raw=False, strict_map_key=False, ext_hook=lambda code, data: code)['datetime'] \
+        == pack.EXT_DATETIME
+
+
+def test_compile_path(user_text):
+    text = json.dumps({'data': {'items': [json.loads(user_text)] * 3, 5: 'five'}})
+    getter = RestResponse.compile_path('data.items.1.address.geo.lat')
+    assert RestResponse.compile_path(('data', 'items', '1', 'address', 'geo', 'lat')) is getter
+    lat = json.loads(user_text)['address']['geo']['lat']
+    for obj in (RestResponse.loads(text), RestResponse.loads(text, lazy=True), json.loads(text)):
+        assert getter(obj) == lat
+        assert RestResponse.compile_path('data.items.-1.id')(obj) == 1
+        assert RestResponse.compile_path('data.missing.key')(obj) is None
+        assert RestResponse.compile_path('data.items.10.id')(obj, default=0) == 0
+        assert RestResponse.compile_path('data.items.name')(obj, default=0) == 0
+        assert RestResponse.compile_path('data.items.0.id.more')(obj) is None
+    obj = RestResponse.loads(text)
+    assert obj.get_path('data.5') == 'five'
+    assert isinstance(obj.get_path('data.items.0.address'), RestResponse.RestObject)
+    assert obj.get_paths(['data.items.0.id', 'data.items.0.missing', 'data.items.2.name'], default='') == [
+        1, '', json.loads(user_text)['name']
+    ]
+    assert 'missing' not in obj.data['items'][0].__none_props__
+
+    lazy = RestResponse.loads(text, lazy=True)
+    assert isinstance(lazy.get_path('data.items.0.address'), RestResponse.LazyRestObject)
+    snapshot = obj.snapshot()
+    snapshot.get_path('data.items.0.address').city = 'Elsewhere'
+    assert obj.get_path('data.items.0.address.city') == json.loads(user_text)['address']['city']
+
+
+def test_rest_list_where():
+    users = RestResponse.parse([
+        {'id': x, 'status': 'active' if x % 2 else 'inactive', 'address': {'city': 'city %s' % (x % 3)}}
+        for x in range(10)
+    ])
+    users.append({'id': 10, 'tags': ['unhashable']})
+    assert [u.id for u in users.where(status='active')] == [1, 3, 5, 7, 9]
+    assert [u.id for u in users.where({'address.city': 'city 1'}, status='active')] == [1, 7]
+    assert [u.id for u in users.where(address__city='city 0')] == [0, 3, 6, 9]
+    assert [u.id for u in users.where(status=None)] == [10]
+    assert [u.id for u in users.where(tags=['unhashable'])] == [10]
+    assert isinstance(users.where(status='missing'), RestResponse.RestList) and not users.where(status='missing')
+    assert users.find(id=4) is users[4]
+    assert users.find(id=40) is None
+
+    index = users.index_by('status')
+    assert users.index_by('status') is index
+    assert [u.id for u in index['inactive']] == [0, 2, 4, 6, 8]
+    users.append({'id': 11, 'status': 'active'})
+    assert users.index_by('status') is not index
+    assert users.where(status='active')[-1].id == 11
+    users.remove(users.find(id=11))
+    del users[0]
+    assert users.find(id=11) is None and users.find(id=0) is None
+
+    # items changed in place are verified against the index, drop_indexes picks up new matches
+    users.find(id=1).status = 'inactive'
+    assert [u.id for u in users.where(status='active')] == [3, 5, 7, 9]
+    users.find(id=2).status = 'active'
+    users.drop_indexes()
+    assert [u.id for u in users.where(status='active')] == [2, 3, 5, 7, 9]
+
+    # reordering the list drops its indexes, so matches keep the list order
+    users.sort(key=lambda u: -u.id)
+    assert [u.id for u in users.where(status='active')] == [9, 7, 5, 3, 2]
+    assert [u.id for u in users.index_by('status')['active']] == [9, 7, 5, 3, 2]
+    users.reverse()
+    assert [u.id for u in users.where(status='active')] == [2, 3, 5, 7, 9]
+    users *= 2
+    assert len(users.index_by('status')['active']) == 10
+    del users[10:]
+    with pytest.raises(TypeError):
+        users.index_by('status')['active'] = ()
+    assert len(users.index_by('status')['active']) == 5
+
+    lazy = RestResponse.loads(RestResponse.dumps(users), lazy=True)
+    assert isinstance(lazy.find(id=3), RestResponse.LazyRestObject)
+    assert lazy.find(id=3) is lazy[2]
+    lazy.sort(key=lambda u: -u.id)
+    assert lazy.find(id=3) is lazy[-3]
+
+
+def test_rest_list_columns():
+    users = RestResponse.parse([
+        {'id': 1, 'balance': 10.5, 'address': {'city': 'Boston'}},
+        {'id': 2, 'address': {}},
+        {'id': 3, 'balance': None, 'address': {'city': 'Austin'}},
+    ])
+    assert users.pluck('id') == [1, 2, 3]
+    assert users.pluck('address.city') == ['Boston', None, 'Austin']
+    assert users.pluck('address.city', default='') == ['Boston', '', 'Austin']
+    assert users.pluck('balance') == [10.5, None, None]
+    assert type(users.pluck('address')) is list and isinstance(users.pluck('address')[0], RestResponse.RestObject)
+    assert users.to_columns(['id', 'address.city']) == {'id': [1, 2, 3], 'address.city': ['Boston', None, 'Austin']}
+    lazy = RestResponse.loads(RestResponse.dumps(users), lazy=True)
+    assert lazy.to_columns(['id', 'address.city']) == users.to_columns(['id', 'address.city'])
+
+
+def test_rest_list_to_numpy():
+    numpy = pytest.importorskip('numpy')
+    users = RestResponse.parse([
+        {'id': 1, 'balance': 10.5, 'active': True, 'city': 'Boston'},
+        {'id': 2, 'active': False},
+        {'id': 3, 'balance': None, 'active': True, 'city': 'Austin'},
+    ])
+    ids = users.to_numpy('id', dtype='int32')
+    assert ids.dtype == numpy.int32 and ids.tolist() == [1, 2, 3]
+    assert not isinstance(users.to_numpy('id'), numpy.ma.MaskedArray)
+
+    balance = users.to_numpy('balance')
+    assert balance.dtype == numpy.float64 and balance[0] == 10.5 and numpy.isnan(balance[1:]).all()
+    balance = users.to_numpy('balance', missing='mask')
+    assert balance.mask.tolist() == [False, True, True] and balance.sum() == 10.5
+
+    # integer columns with missing values become float64, unless masked
+    users[1].id = None
+    assert users.to_numpy('id').dtype == numpy.float64 and numpy.isnan(users.to_numpy('id')[1])
+    ids = users.to_numpy('id', dtype='int64', missing='mask')
+    assert ids.dtype == numpy.int64 and ids.compressed().tolist() == [1, 3]
+    with pytest.raises(ValueError):
+        users.to_numpy('id', dtype='int64')
+
+    cities = users.to_numpy('city', missing='mask')
+    assert cities.compressed().tolist() == ['Boston', 'Austin']
+    with pytest.raises(ValueError):
+        users.to_numpy('city')
+    with pytest.raises(ValueError):
+        users.to_numpy('city', missing='zero')
+
+
+def test_loads_compact_records():
+    text = RestResponse.dumps({'results': [
+        {'id': x, 'name': 'user %s' % x, 'items': [1, 2], 'address': {'city': 'city %s' % x}} for x in range(3)
+    ], 'next': None})
+    obj = RestResponse.loads(text, records='compact')
+    assert isinstance(obj, RestResponse.RestObject)
+    record = obj.results[1]
+    assert isinstance(record, RestResponse.RestRecord) and isinstance(record.address, RestResponse.RestRecord)
+    assert type(record) is type(obj.results[0])
+    assert record.id == 1 and record['name'] == 'user 1' and record.address.city == 'city 1'
+    assert record['items'] == [1, 2] and isinstance(record['items'], RestResponse.RestList)
+    assert isinstance(record.missing, RestResponse.NoneProp) and not record.missing
+    assert isinstance(record.missing.nested, RestResponse.NoneProp)
+    assert record['missing'] == None  # noqa: E711
+    assert list(record) == list(record.keys()) == ['id', 'name', 'items', 'address'] and 'id' in record
+    assert record.get('id') == 1 and record.get('missing', 'default') == 'default'
+
+    # records compare and encode like the objects they replace
+    assert obj == RestResponse.loads(text) and RestResponse.loads(text) == obj
+    assert RestResponse.dumps(obj) == text
+    assert obj.pretty_print() == RestResponse.loads(text).pretty_print()
+    assert obj.to_primitive() == json.loads(text)
+    assert pickle.loads(pickle.dumps(record)) == record
+    assert obj.results.find(id=2) is obj.results[2]
+    assert obj.results.pluck('address.city') == ['city 0', 'city 1', 'city 2']
+
+    # keys are fixed
+    record.id = '1'
+    record['name'] = 'renamed'
+    assert record.id == '1' and record.name == 'renamed'
+    with pytest.raises(AttributeError):
+        record.new_key = 1
+    with pytest.raises(KeyError):
+        record['new_key'] = 1
+    with pytest.raises(AttributeError, match='use to_object'):
+        record.missing.x = 1
+    with pytest.raises(AttributeError, match="'missing' is not a key"):
+        record.missing.nested.x = 1
+    with pytest.raises(KeyError, match='use to_object'):
+        record['missing']['x'] = 1
+    with pytest.raises(AttributeError):
+        del record.id
+    full = record.to_object()
+    assert isinstance(full, RestResponse.RestObject) and full == record
+    full.new_key = 1
+    assert full.new_key == 1
+
+    # shapes records can't hold stay RestObjects
+    items = RestResponse.loads('[{"a": 1, "a": 2}, {}, {"_slot0": 1}, {"b": 1}]', records='compact')
+    assert [type(item).__name__ for item in items] == ['RestObject', 'RestObject', 'RestObject', 'RestRecord']
+    with pytest.raises(ValueError):
+        RestResponse.loads(text, records='compact', lazy=True)
+    with pytest.raises(ValueError):
+        RestResponse.loads(text, records='tuple')
+
+
+def test_loads_interning():
+    key = ''.join(['account', '_status'])
+    text = json.dumps([{key: 'active', 'tags': ['a' * 4, 'b' * 4], 'note': 'x' * 20} for _ in range(3)])
+
+    # keys are shared across documents and streamed items
+    first, second = RestResponse.loads(text), RestResponse.loads(text)
+    assert next(iter(first[0])) is next(iter(second[0])) is next(iter(second[2]))
+    items = list(RestResponse.iter_loads(io.StringIO(text), path='item'))
+    assert next(iter(items[0])) is next(iter(items[2])) is next(iter(first[0]))
+
+    # values are only interned on request
+    assert first[0][key] == first[1][key] and first[0][key] is not first[1][key]
+    table = RestResponse.utils.InternTable(max_size=2, max_length=8)
+    for obj in (RestResponse.loads(text, intern_values=table), RestResponse.loads(text, intern_values=table)):
+        assert obj[0][key] is obj[2][key] and obj[0]['tags'][0] is obj[2]['tags'][0]
+        assert obj[0]['note'] is not obj[2]['note']
+    # the table is full, later values are no longer added
+    assert len(table) == 2 and obj[0]['tags'][1] is not obj[2]['tags'][1]
+    assert obj == first
+
+    compact = RestResponse.loads(text, records='compact', intern_values=True)
+    assert compact[0][key] is compact[1][key] and compact[0][key] in RestResponse.utils.INTERN_TABLE._strings
+    streamed = list(RestResponse.iter_loads(io.StringIO(text), path='item', intern_values=table))
+    assert streamed[0][key] is streamed[1][key]